@@ -0,0 +1,125 @@
+"""
+Бенчмарк обработки обновлений Telegram-ботом.
+
+Повторяет записанный поток обновлений (benchmarks/updates.json) от множества чатов
+против локального поддельного Bot API с задержкой ответа и сравнивает:
+  - последовательную обработку (как bot.polling());
+  - AsyncBotRuntime (параллельно по чатам, по порядку внутри чата).
+
+Запуск из папки проекта:
+    python benchmarks/bot_replay.py --chats 50 --api-delay-ms 30
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flower_delivery.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from telebot.types import Update
+import telegram_bot
+from main import telegram_api
+from main.bot_runtime import AsyncBotRuntime
+from main.models import User, Order, Product
+from main.tests.fake_telegram import FakeTelegramServer
+
+
+def load_stream(path, chats):
+    """Размножает записанный поток на нужное число чатов, сохраняя порядок сообщений в каждом чате"""
+    recorded = json.loads(Path(path).read_text(encoding="utf-8"))
+    recorded_chats = sorted({update["message"]["chat"]["id"] for update in recorded})
+    stream = []
+    for copy_number in range(0, chats, len(recorded_chats)):
+        for update in recorded:
+            update = copy.deepcopy(update)
+            chat_id = update["message"]["chat"]["id"] + copy_number
+            update["message"]["chat"]["id"] = update["message"]["from"]["id"] = chat_id
+            stream.append(update)
+    for update_id, update in enumerate(stream, start=1):
+        update["update_id"] = update_id
+    return stream
+
+
+def create_customers(stream):
+    """Создает пользователей, привязанных к чатам, с историей заказов"""
+    chat_ids = sorted({update["message"]["chat"]["id"] for update in stream})
+    users = User.objects.bulk_create(
+        User(username=f"bench{chat_id}", telegram_chat_id=str(chat_id)) for chat_id in chat_ids
+    )
+    orders = Order.objects.bulk_create(
+        Order(user=user, total_price=2500, status="delivered") for user in users for _ in range(10)
+    )
+    product = Product.objects.create(name="Букет Роз", price=2500, image="products/roses.jpg")
+    Order.products.through.objects.bulk_create(
+        Order.products.through(order_id=order.id, product_id=product.id) for order in orders
+    )
+
+
+def run_sequential(server, stream):
+    server.requests.clear()
+    start = time.perf_counter()
+    for data in stream:
+        telegram_bot.bot.process_new_updates([Update.de_json(data)])
+    return time.perf_counter() - start
+
+
+def run_async(server, stream, concurrency):
+    server.requests.clear()
+    server.updates = stream
+    runtime = AsyncBotRuntime(telegram_bot.bot, concurrency=concurrency, poll_timeout=0)
+    start = time.perf_counter()
+    asyncio.run(runtime.run(stop_when_idle=True))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=30, help="Сколько чатов одновременно пишут боту")
+    parser.add_argument("--api-delay-ms", type=float, default=30, help="Задержка ответа поддельного Bot API")
+    parser.add_argument("--concurrency", type=int, default=8, help="Лимит параллельных обработчиков")
+    parser.add_argument("--stream", default=Path(__file__).with_name("updates.json"), help="Файл с записанными обновлениями")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)  # В settings включен DEBUG-лог каждого запроса
+
+    # Отдельная временная база, чтобы не трогать рабочую
+    connection.settings_dict["TEST"]["MIGRATE"] = False
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    server = FakeTelegramServer(delay=args.api_delay_ms / 1000).start()
+    settings.TELEGRAM_API_URL = server.url
+    telegram_api._client = telegram_api.TelegramClient(
+        settings.TELEGRAM_BOT_TOKEN, server.url,
+        limiter=telegram_api.RateLimiter(global_rate=10 ** 6, chat_rate=10 ** 6),  # Поддельный API лимитов не имеет
+    )
+
+    try:
+        stream = load_stream(args.stream, args.chats)
+        create_customers(stream)
+
+        sequential = run_sequential(server, stream)
+        concurrent = run_async(server, stream, args.concurrency)
+    finally:
+        server.stop()
+
+    print(f"Обновлений: {len(stream)}, чатов: {args.chats}, задержка API: {args.api_delay_ms} мс")
+    print(f"Последовательно:  {sequential:.2f} с ({len(stream) / sequential:.0f} обновл./с)")
+    print(f"AsyncBotRuntime:  {concurrent:.2f} с ({len(stream) / concurrent:.0f} обновл./с), "
+          f"concurrency={args.concurrency}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,4 +13,6 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flower_delivery.settings')
 
+# Через это приложение работает и webhook Telegram-бота (/telegram/webhook/):
+# обновления обрабатываются воркерами сайта, отдельный процесс telegram_bot.py не нужен.
 application = get_asgi_application()
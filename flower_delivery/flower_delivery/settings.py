@@ -14,7 +14,9 @@ from pathlib import Path
 from decouple import config
 
 TELEGRAM_BOT_TOKEN = config("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_URL = config("TELEGRAM_API_URL", default="https://api.telegram.org")  # Можно заменить на локальный сервер для тестов
 SITE_URL = config("SITE_URL", default="http://127.0.0.1:8000")
+TELEGRAM_WEBHOOK_SECRET = config("TELEGRAM_WEBHOOK_SECRET", default="")  # Пусто - webhook выключен, бот работает через polling
 ADMIN_TELEGRAM_ID = config("ADMIN_TELEGRAM_ID")
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -81,14 +83,77 @@ WSGI_APPLICATION = 'flower_delivery.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# Профиль базы выбирается переменной DB_ENGINE в .env: sqlite (по умолчанию) или postgresql
+DB_ENGINE = config("DB_ENGINE", default="sqlite")
+
+if DB_ENGINE == "postgresql":
+    DB_POOL = config("DB_POOL", default=False, cast=bool)  # Пул соединений psycopg (pip install "psycopg[pool]")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config("DB_NAME", default="flower_delivery"),
+            'USER': config("DB_USER", default="postgres"),
+            'PASSWORD': config("DB_PASSWORD", default=""),
+            'HOST': config("DB_HOST", default="localhost"),
+            'PORT': config("DB_PORT", default="5432"),
+            # С пулом соединения держит пул, а Django закрывает их после запроса (CONN_MAX_AGE = 0 обязателен)
+            'CONN_MAX_AGE': 0 if DB_POOL else config("DB_CONN_MAX_AGE", default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,  # Проверять соединение, пережившее перезапуск базы
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config("DB_POOL_MIN_SIZE", default=2, cast=int),
+                    'max_size': config("DB_POOL_MAX_SIZE", default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    # SQLite: сайт и бот пишут в базу одновременно. WAL позволяет читать во время записи,
+    # timeout - ждать освободившейся блокировки вместо ошибки "database is locked",
+    # IMMEDIATE - транзакция сразу берет блокировку записи и не упирается в нее посередине
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config("DB_NAME", default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config("DB_CONN_MAX_AGE", default=60, cast=int),  # Не открывать файл заново на каждый запрос
+            'OPTIONS': {
+                'init_command': (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"  # В режиме WAL надежно и без fsync на каждую транзакцию
+                    "PRAGMA cache_size=-20000;"  # 20 МБ кэша страниц на соединение
+                    "PRAGMA temp_store=MEMORY;"
+                    "PRAGMA mmap_size=134217728;"  # 128 МБ файла базы - через отображение в память
+                ),
+                'timeout': config("DB_TIMEOUT", default=20, cast=int),  # Секунд ожидания блокировки
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Сайт и бот (telegram_bot.py) - разные процессы, а версии кэша (каталог, счетчик корзины, "Мои заказы" в боте)
+# сбрасываются там, где изменились данные. Поэтому кэш должен быть общим для процессов:
+# по умолчанию - файлы в CACHE_LOCATION, для нагрузки - Redis (CACHE_BACKEND=redis, pip install redis).
+# locmem (память процесса) подходит, только если сайт и бот не запускаются раздельно
+
+CACHE_BACKEND = config("CACHE_BACKEND", default="file")
+CACHE_BACKENDS = {
+    "file": 'django.core.cache.backends.filebased.FileBasedCache',
+    "redis": 'django.core.cache.backends.redis.RedisCache',
+    "locmem": 'django.core.cache.backends.locmem.LocMemCache',
+}
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config(
+            "CACHE_LOCATION",
+            default={"file": str(BASE_DIR / 'cache'), "redis": "redis://127.0.0.1:6379"}.get(CACHE_BACKEND, ""),
+        ),
     }
 }
 
-
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -2,9 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from main.views import telegram_webhook
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('telegram/webhook/', telegram_webhook, name='telegram_webhook'),  # Обновления от Telegram (режим webhook)
     path('', include('main.urls')),  # Подключаем маршруты приложения
 ]
 
@@ -1,7 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 from .models import Product, Order, Review
+from .order_status import advance_orders, change_statuses
+from .pagination import ApproximateCountPaginator
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
+from django.forms.models import BaseInlineFormSet
 
 admin.site.register(Product)
 admin.site.register(Review)
@@ -9,21 +13,76 @@ admin.site.register(Review)
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'status', 'total_price', 'created_at', 'telegram_chat_id')
+    list_select_related = ('user',)  # Пользователь - JOIN, а не запрос на каждую строку
     list_filter = ('status', 'created_at')
+    date_hierarchy = 'created_at'  # Переход по годам/месяцам/дням - диапазоны по индексу order_created_idx
     search_fields = ('user__username',)
-    ordering = ('-created_at',)
+    ordering = ('-created_at', '-id')
     list_editable = ('status',)
+    paginator = ApproximateCountPaginator  # Без COUNT(*) по всей таблице на каждой странице
+    show_full_result_count = False  # И без второго COUNT для "всего N" при фильтрах
+    raw_id_fields = ('user',)  # Форма заказа не загружает список всех пользователей
+    actions = ['advance_status']
+
+    @admin.action(description="Перевести выбранные заказы в следующий статус")
+    def advance_status(self, request, queryset):
+        changed = advance_orders(queryset)  # Один UPDATE и одна пачка уведомлений
+        self.message_user(request, f"Статус изменен у заказов: {len(changed)}.")
+
+    def changelist_view(self, request, extra_context=None):
+        # Статусы, измененные прямо в списке, копим в save_model и записываем одним UPDATE.
+        # Запись - в той же транзакции, что и журнал админки: если UPDATE не удался,
+        # откатываются и записи "Статус изменен", и сообщение об успехе не показывается
+        request._deferred_statuses = {}
+        if request.method != 'POST':
+            return super().changelist_view(request, extra_context)
+        try:
+            with transaction.atomic():
+                response = super().changelist_view(request, extra_context)
+                if request._deferred_statuses:
+                    change_statuses(request._deferred_statuses)
+        except Exception:
+            list(messages.get_messages(request))  # Помечаем очередь сообщений прочитанной - они не сохранятся
+            raise
+        return response
+
+    def save_model(self, request, obj, form, change):
+        deferred = getattr(request, '_deferred_statuses', None)
+        if deferred is not None and change and form.changed_data == ['status']:
+            deferred[obj.pk] = obj.status
+            return
+        super().save_model(request, obj, form, change)
 
 # Убираем стандартную регистрацию User
 admin.site.unregister(User)
 
 # Настраиваем модель User с твоими настройками
-class OrderInline(admin.StackedInline):
+class RecentOrdersFormSet(BaseInlineFormSet):
+    """Только последние заказы пользователя - страница пользователя не грузит всю историю"""
+
+    def get_queryset(self):
+        # Формсет вызывает get_queryset() для каждой формы - срез строим один раз, иначе каждый вызов - новый запрос
+        if not hasattr(self, '_recent_orders'):
+            self._recent_orders = super().get_queryset().order_by('-created_at', '-id')[:OrderInline.max_orders]
+            for order in self._recent_orders:  # Запрос выполняется здесь, результат queryset запоминает
+                order.user = self.instance  # Подпись строки (Order.__str__) без запроса пользователя на каждый заказ
+        return self._recent_orders
+
+
+class OrderInline(admin.TabularInline):
     model = Order
-    fields = ('telegram_chat_id',)
-    readonly_fields = ('telegram_chat_id',)
+    formset = RecentOrdersFormSet
+    max_orders = 20
+    verbose_name_plural = f"Последние заказы (до {max_orders}, остальные - в разделе \"Заказы\")"
+    fields = ('created_at', 'status', 'total_price', 'telegram_chat_id')
+    readonly_fields = fields
+    show_change_link = True  # Правка заказа - на его собственной странице
+    can_delete = False
     extra = 0
 
+    def has_add_permission(self, request, obj=None):
+        return False  # Заказы не создаются со страницы пользователя
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'is_staff')
@@ -7,3 +7,6 @@ class MainConfig(AppConfig):
 
     def ready(self):
         import main.signals  # Подключаем сигналы
+        from django.db.models.signals import post_migrate
+        from main.search import ensure_search_index
+        post_migrate.connect(ensure_search_index, sender=self)  # Поисковая таблица FTS5 (или индекс в PostgreSQL)
@@ -0,0 +1,137 @@
+#
+# Список заказов в боте ("📦 Мои заказы")
+# -------------------------------------------------------
+# Страница из BOT_ORDERS_PER_PAGE заказов строится двумя запросами: заказы с флагом отзыва (EXISTS)
+# и букеты всех заказов страницы (prefetch). Готовый текст кэшируется для пользователя;
+# сигналы заказов и отзывов меняют версию его кэша (см. signals.py), так что старые страницы не показываются.
+# Версию меняет процесс сайта (оформление, админка, отзывы), а читает процесс бота, поэтому кэш должен быть
+# общим для процессов (CACHES в settings.py: файлы или Redis). С кэшем в памяти процесса бот показывал бы
+# старые статусы до BOT_ORDERS_TIMEOUT.
+# Более старые заказы листаются кнопками под сообщением (callback_data "orders:<курсор>").
+#
+
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch
+from django.urls import reverse
+from django.utils import timezone
+from .models import Order, Product, Review
+from .pagination import keyset_filter
+from .utils import get_order_bouquet
+
+
+BOT_ORDERS_PER_PAGE = 5
+BOT_ORDERS_TIMEOUT = 10 * 60  # Названия букетов могут поменяться без смены версии - держим недолго
+ORDERING = ("-created_at", "-id")
+CALLBACK_PREFIX = "orders:"
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# ---- Курсор для кнопок ----
+# callback_data в Telegram ограничена 64 байтами, поэтому курсор короче, чем в pagination.encode_cursor:
+# created_at в микросекундах и id последнего показанного заказа
+
+def encode_callback_cursor(order):
+    micros = (order.created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}:{order.id}"
+
+
+def decode_callback_cursor(cursor):
+    """:return: (created_at, id) или None, если курсор поврежден"""
+    try:
+        micros, order_id = (int(part) for part in cursor.split(":"))
+    except ValueError:
+        return None
+    return EPOCH + timedelta(microseconds=micros), order_id
+
+
+# ---- Кэш ----
+
+def _version_key(user_id):
+    return f"bot_orders_version:{user_id}"
+
+
+def invalidate_bot_orders(user_id):
+    """Заказы или отзывы пользователя изменились - все закэшированные страницы больше не актуальны"""
+    cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def _page_key(user_id, cursor):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), None)
+        version = cache.get(_version_key(user_id))
+    return f"bot_orders:{user_id}:{version}:{cursor or 'first'}"
+
+
+# ---- Страница заказов ----
+
+def render_order(order):
+    """Текст одного заказа (букеты и флаг отзыва должны быть уже загружены)"""
+    bouquet = get_order_bouquet(order)
+    lines = [
+        f"🔹 *Заказ №{order.id}*",
+        f"📅 Дата: {timezone.localtime(order.created_at).strftime('%d.%m.%Y %H:%M')}",
+        f"🔄 Статус: {order.get_status_display()}",
+        f"💐 Букет: {bouquet.name if bouquet else 'Не указан'}",
+    ]
+    # Ссылка для отзыва, если статус "Доставлен" и отзыв не оставлен
+    if order.status == "delivered" and not order.has_review:
+        lines.append(f"📝 [Оставить отзыв]({settings.SITE_URL}{reverse('leave_review', args=[order.id])})")
+    # Ссылка для повторного заказа - только если букет не удален
+    if bouquet:
+        lines.append(f"🔄 [Повторить заказ]({settings.SITE_URL}{reverse('product_detail', args=[bouquet.id])})")
+    lines.append("------------------------")
+    return "\n".join(lines) + "\n"
+
+
+def build_orders_page(user_id, cursor=None):
+    """
+    Страница заказов пользователя, от новых к старым. Два запроса независимо от числа заказов.
+    :return: (текст сообщения, курсор следующей страницы или None)
+    """
+    orders = (
+        Order.objects.filter(user_id=user_id)
+        .annotate(has_review=Exists(Review.objects.filter(order=OuterRef("pk"))))
+        .prefetch_related(Prefetch("products", queryset=Product.objects.only("id", "name")))
+        .order_by(*ORDERING)
+    )
+    position = decode_callback_cursor(cursor) if cursor else None
+    if position:
+        orders = orders.filter(keyset_filter(ORDERING, position))
+
+    orders = list(orders[:BOT_ORDERS_PER_PAGE + 1])  # Лишний заказ показывает, есть ли следующая страница
+    if not orders:
+        return ("📭 У вас пока нет заказов." if not position else "📭 Более старых заказов нет."), None
+
+    next_cursor = None
+    if len(orders) > BOT_ORDERS_PER_PAGE:
+        orders = orders[:BOT_ORDERS_PER_PAGE]
+        next_cursor = encode_callback_cursor(orders[-1])
+
+    title = "📦 *Ваши последние заказы:*" if not position else "📦 *Более ранние заказы:*"
+    text = f"{title}\n\n" + "".join(render_order(order) for order in orders)
+    text += f"\n🌐 [Посмотреть все заказы]({settings.SITE_URL}{reverse('user_orders')})"
+    return text, next_cursor
+
+
+def get_orders_page(user_id, cursor=None):
+    """Страница заказов из кэша (или построенная и положенная в кэш)"""
+    key = _page_key(user_id, cursor)
+    page = cache.get(key)
+    if page is None:
+        page = build_orders_page(user_id, cursor)
+        cache.set(key, page, BOT_ORDERS_TIMEOUT)
+    return page
+
+
+def orders_keyboard(cursor, next_cursor):
+    """Кнопки листания (формат reply_markup Bot API) или None, если листать некуда"""
+    buttons = []
+    if cursor:
+        buttons.append({"text": "⏮ К последним", "callback_data": CALLBACK_PREFIX})
+    if next_cursor:
+        buttons.append({"text": "Более ранние ➡️", "callback_data": CALLBACK_PREFIX + next_cursor})
+    return {"inline_keyboard": [buttons]} if buttons else None
@@ -0,0 +1,143 @@
+#
+# Асинхронный запуск Telegram-бота
+# -------------------------------------------------------
+# Long polling на asyncio: обновления разных чатов обрабатываются параллельно
+# (не больше concurrency одновременно), а сообщения одного чата - строго по очереди.
+# Обработчики telebot и запросы к базе выполняются в пуле потоков и не блокируют опрос Telegram.
+# Запасной режим на случай, когда webhook (main.views.telegram_webhook) не настроен.
+#
+
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from django.db import close_old_connections
+from telebot.types import Update
+from .telegram_api import TelegramAPIError, get_client
+
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 8  # Сколько обновлений обрабатываем одновременно
+POLL_TIMEOUT = 25  # Сколько секунд Telegram держит запрос getUpdates, если обновлений нет
+MAX_PENDING = 1000  # Больше стольких необработанных обновлений новые не запрашиваем
+ERROR_DELAY = 3  # Пауза после ошибки связи с Telegram, в секундах
+
+
+def update_chat_id(data):
+    """ID чата, к которому относится обновление (для сохранения порядка внутри чата)"""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in data:
+            return data[key]["chat"]["id"]
+    if "callback_query" in data:
+        callback = data["callback_query"]
+        if callback.get("message"):
+            return callback["message"]["chat"]["id"]
+        return callback["from"]["id"]
+    return None
+
+
+def process_update(bot, data):
+    """
+    Передает одно обновление (словарь из JSON Telegram) обработчикам бота.
+    Используется и при long polling, и в webhook. Выполняется в рабочем потоке.
+    """
+    close_old_connections()
+    try:
+        bot.process_new_updates([Update.de_json(data)])
+    except Exception:
+        logger.exception("Ошибка при обработке обновления %s", data.get("update_id"))
+    finally:
+        close_old_connections()
+
+
+class AsyncBotRuntime:
+    """Получает обновления через long polling и раздает их обработчикам бота"""
+
+    def __init__(self, bot, concurrency=CONCURRENCY, poll_timeout=POLL_TIMEOUT, max_pending=MAX_PENDING):
+        self.bot = bot  # TeleBot с threaded=False: обработчики выполняются в наших потоках
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.max_pending = max_pending
+        self.offset = None
+        self.pending = 0  # Получено, но еще не обработано
+        self.processed = 0
+        self.queues = {}  # Очереди обновлений по чатам
+        self.tasks = set()
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bot-handler")
+        self.semaphore = None
+
+    def handle_update(self, data):
+        """Обрабатывает одно обновление. Выполняется в пуле потоков."""
+        process_update(self.bot, data)
+
+    def submit(self, data):
+        """Ставит обновление в очередь его чата"""
+        chat_id = update_chat_id(data)
+        key = chat_id if chat_id is not None else ("update", data["update_id"])
+        self.pending += 1
+
+        queue = self.queues.get(key)
+        if queue is not None:
+            queue.append(data)  # Чат уже обрабатывается - дождется своей очереди
+            return
+
+        self.queues[key] = deque([data])
+        task = asyncio.create_task(self._drain_chat(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _drain_chat(self, key):
+        """Обрабатывает обновления одного чата по порядку"""
+        loop = asyncio.get_running_loop()
+        queue = self.queues[key]
+        try:
+            while queue:
+                data = queue.popleft()
+                async with self.semaphore:
+                    await loop.run_in_executor(self.executor, self.handle_update, data)
+                self.pending -= 1
+                self.processed += 1
+        finally:
+            del self.queues[key]
+
+    async def fetch_updates(self):
+        """Запрашивает обновления в отдельном потоке, чтобы не блокировать цикл событий"""
+        return await asyncio.to_thread(get_client().get_updates, self.offset, self.poll_timeout)
+
+    async def run(self, stop_when_idle=False):
+        """
+        Основной цикл.
+        :param stop_when_idle: завершиться, когда новых обновлений нет и все обработаны (для тестов и бенчмарков)
+        """
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            while True:
+                while self.pending >= self.max_pending:
+                    await asyncio.sleep(0.05)  # Не набираем больше, чем успеваем обработать
+
+                try:
+                    updates = await self.fetch_updates()
+                except (TelegramAPIError, requests.RequestException) as error:
+                    logger.warning("Не удалось получить обновления: %s", error)
+                    await asyncio.sleep(ERROR_DELAY)
+                    continue
+
+                for data in updates:
+                    self.offset = data["update_id"] + 1
+                    self.submit(data)
+
+                if stop_when_idle and not updates:
+                    await self.join()
+                    return
+        finally:
+            self.executor.shutdown(wait=False)
+
+    async def join(self):
+        """Дожидается обработки всех полученных обновлений"""
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    def run_forever(self):
+        asyncio.run(self.run())
@@ -0,0 +1,97 @@
+#
+# Кто пишет боту: chat_id -> пользователь сайта
+# -------------------------------------------------------
+# Кэш в памяти процесса бота (LRU с ограниченным сроком жизни): частые сообщения активных
+# пользователей не ходят в базу за User. /start сбрасывает запись чата при перепривязке.
+# У каждого процесса свой кэш - привязка, сделанная в другом процессе, видна не позже чем через CHAT_USER_TTL.
+#
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from .models import User
+
+
+CHAT_USER_TTL = 5 * 60  # Секунд
+CHAT_USER_MAXSIZE = 10_000  # Чатов в кэше
+
+# user_id - None, если чат не привязан к пользователю сайта
+# Администраторы определяются по ADMIN_TELEGRAM_ID (ChatUsers.is_admin), а не по записи в кэше
+ChatUser = namedtuple("ChatUser", ["user_id"])
+
+
+def parse_admin_ids(value):
+    """ADMIN_TELEGRAM_ID ("123" или "123, 456") -> множество chat_id строками"""
+    return frozenset(part for part in value.replace(",", " ").split() if part)
+
+
+class ChatUserCache:
+    """LRU-кэш со сроком жизни записей. Потокобезопасный: бот обрабатывает сообщения в нескольких потоках."""
+
+    def __init__(self, maxsize=CHAT_USER_MAXSIZE, ttl=CHAT_USER_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # chat_id -> (срок годности, ChatUser)
+        self._lock = threading.Lock()
+
+    def get(self, chat_id):
+        """Запись из кэша или None, если ее нет или она устарела"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[chat_id]
+                return None
+            self._entries.move_to_end(chat_id)  # Недавно использованные вытесняются последними
+            return value
+
+    def set(self, chat_id, value):
+        with self._lock:
+            self._entries[chat_id] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def forget(self, chat_id=None, user_id=None):
+        """Убирает запись чата и (если указан user_id) все чаты, привязанные к этому пользователю"""
+        with self._lock:
+            self._entries.pop(chat_id, None)
+            if user_id is not None:
+                for key in [key for key, (_, value) in self._entries.items() if value.user_id == user_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+chat_user_cache = ChatUserCache()  # Общий кэш процесса
+
+
+class ChatUsers:
+    """Поиск пользователя по чату через кэш; администраторы - по списку из настроек, без запросов"""
+
+    def __init__(self, admin_ids, cache=None):
+        self.admin_ids = admin_ids
+        self.cache = chat_user_cache if cache is None else cache
+
+    def is_admin(self, chat_id):
+        return str(chat_id) in self.admin_ids
+
+    def get(self, chat_id):
+        chat_id = str(chat_id)
+        chat_user = self.cache.get(chat_id)
+        if chat_user is None:
+            chat_user = ChatUser(User.objects.filter(telegram_chat_id=chat_id).values_list("id", flat=True).first())
+            self.cache.set(chat_id, chat_user)  # Непривязанный чат тоже кэшируем - до /start
+        return chat_user
+
+    def relinked(self, chat_id, user_id=None):
+        """Чат привязан к пользователю заново (/start) - прежние записи недействительны"""
+        self.cache.forget(str(chat_id), user_id)
@@ -0,0 +1,81 @@
+#
+# Строки корзины с количеством
+# -------------------------------------------------------
+# Одинаковые букеты (тот же товар, адрес, открытка и подпись) хранятся одной строкой Cart с quantity.
+# Добавление - атомарный UPDATE quantity = quantity + n, новая строка создается только если такой еще нет.
+# При оформлении каждая единица количества становится отдельным заказом (один заказ = один букет).
+#
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Cart
+
+
+def add_cart_line(user, product_id, quantity=1, address="", card_text="", signature=""):
+    """Добавляет букеты в корзину: увеличивает количество в существующей строке или создает новую"""
+    line = dict(user=user, product_id=product_id, address=address, card_text=card_text, signature=signature)
+
+    if Cart.objects.filter(**line).update(quantity=F('quantity') + quantity):
+        return
+    try:
+        with transaction.atomic():  # Точка сохранения: при гонке откатываем только эту вставку
+            Cart.objects.create(quantity=quantity, **line)
+    except IntegrityError:
+        # Параллельный запрос успел создать такую же строку - прибавляем к ней
+        Cart.objects.filter(**line).update(quantity=F('quantity') + quantity)
+
+
+def remove_one(cart_item):
+    """Убирает из строки корзины один букет; последний - вместе со строкой"""
+    if cart_item.quantity > 1:
+        Cart.objects.filter(pk=cart_item.pk, quantity__gt=1).update(quantity=F('quantity') - 1)
+    else:
+        cart_item.delete()
+
+
+def save_cart_details(user, items, changed):
+    """
+    Записывает адреса и открытки, введенные на странице корзины.
+    :param items: все строки корзины пользователя (с уже измененными полями)
+    :param changed: строки, в которых что-то поменялось
+    :return: актуальный список строк
+    """
+    if not changed:
+        return items
+
+    keys = {(item.product_id, item.address, item.card_text, item.signature) for item in items}
+    if len(keys) == len(items):
+        try:
+            with transaction.atomic():
+                Cart.objects.bulk_update(changed, ['address', 'card_text', 'signature'])  # Один UPDATE на все строки
+            return items
+        except IntegrityError:
+            pass  # Строки обменялись данными - промежуточный конфликт уникальности, пересоздаем их
+    return regroup_cart_lines(user, items)
+
+
+def regroup_cart_lines(user, items):
+    """
+    Сохраняет измененные адреса и открытки строк корзины.
+    Строки, которые после правки совпали, объединяются (иначе нарушилась бы уникальность).
+    :param items: строки корзины пользователя с уже измененными полями (все строки)
+    :return: актуальный список строк
+    """
+    merged = {}
+    for item in items:
+        key = (item.product_id, item.address, item.card_text, item.signature)
+        if key in merged:
+            merged[key].quantity += item.quantity
+        else:
+            merged[key] = Cart(user=user, product=item.product, address=item.address,
+                               card_text=item.card_text, signature=item.signature, quantity=item.quantity)
+
+    # Пересоздаем строки двумя запросами: так нет промежуточных конфликтов уникальности
+    with transaction.atomic():
+        Cart.objects.filter(id__in=[item.id for item in items]).delete()
+        return Cart.objects.bulk_create(merged.values())
+
+
+def expand_cart_lines(items):
+    """Строки корзины по одной на каждый букет (для оформления заказов)"""
+    return [item for item in items for _ in range(item.quantity)]
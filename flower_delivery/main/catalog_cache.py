@@ -0,0 +1,98 @@
+#
+# HTTP-кэширование каталога и страниц букетов
+# -------------------------------------------------------
+# Версия каталога - метка времени последнего изменения букетов или отзывов. Ее обновляют сигналы
+# (см. signals.py), поэтому кэш сбрасывается сразу после правки, а не по истечении срока.
+# По версии строятся ETag и Last-Modified: повторный запрос с If-None-Match получает 304 без запросов к базе.
+# Гостям страница целиком отдается из кэша, пока версия не изменится.
+# Продажи меняют только порядок "Популярные" (sold_count), поэтому у этих страниц своя, дополнительная версия:
+# оформление заказа не сбрасывает кэш остальных страниц каталога.
+# Версия хранится в кэше Django - общем для процессов сайта и бота (CACHES в settings.py).
+#
+
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .context_processors import get_cart_item_count
+
+
+VERSION_KEY = "catalog_version"
+POPULAR_VERSION_KEY = "catalog_popular_version"
+PAGE_TIMEOUT = 24 * 60 * 60  # Старые версии страниц просто вытесняются - актуальность задает версия в ключе
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Кэш очищен или перезапущен - начинаем новую версию, старые страницы станут недействительны
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_catalog_version():
+    """Текущая версия каталога (наносекунды с начала эпохи)"""
+    return _get_version(VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Вызывается сигналами при изменении букетов и отзывов"""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def bump_popular_version():
+    """Вызывается при изменении счетчиков продаж - устаревают только страницы, отсортированные по популярности"""
+    cache.set(POPULAR_VERSION_KEY, time.time_ns(), None)
+
+
+def get_page_version(request):
+    """Версия страницы: версия каталога, а для сортировки "Популярные" - более поздняя из нее и версии продаж"""
+    version = get_catalog_version()
+    if request.GET.get("sort") == "popular":
+        version = max(version, _get_version(POPULAR_VERSION_KEY))
+    return version
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag страницы: версия каталога, а для вошедшего пользователя - еще и его шапка (счетчик корзины)"""
+    version = get_page_version(request)
+    if request.user.is_authenticated:
+        return f"{version}-{request.user.pk}-{get_cart_item_count(request.user)}"
+    return str(version)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """Last-Modified только для гостей: у вошедших шапка меняется независимо от каталога"""
+    if request.user.is_authenticated:
+        return None
+    return datetime.fromtimestamp(get_page_version(request) / 1e9, tz=dt_timezone.utc)
+
+
+def cache_catalog_page(view):
+    """
+    Условный GET (ETag/Last-Modified) для всех и кэш готовой страницы для гостей.
+    Вошедшие пользователи получают страницу, отрисованную заново (private, no-cache).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        anonymous = request.method == "GET" and not request.user.is_authenticated
+        if not anonymous:
+            response = view(request, *args, **kwargs)
+        else:
+            key = f"catalog_page:{get_page_version(request)}:{request.get_full_path()}"
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, PAGE_TIMEOUT)
+
+        if anonymous:
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)  # Прокси может хранить, но сверяет ETag
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)(wrapper)
@@ -1,12 +1,35 @@
 from .models import Cart
+from django.core.cache import cache
 from django.db.models import Sum
+from django.utils.functional import SimpleLazyObject
+
+# Счетчик корзины хранится в кэше и сбрасывается при каждом изменении корзины
+# (add_to_cart, delete_cart_item, repeat_order, finalize_order).
+# Время жизни ограничено на случай правок через админку. Кэш общий для процессов (CACHES в settings.py):
+# с кэшем в памяти процесса (locmem) счетчик в других процессах сайта может отставать до CART_COUNT_TIMEOUT.
+CART_COUNT_TIMEOUT = 5 * 60  # секунд
+
+
+def cart_count_cache_key(user_id):
+    return f"cart_item_count:{user_id}"
+
 
 def get_cart_item_count(user):
-    """Возвращает общее количество позиций в корзине пользователя."""
-    return Cart.objects.filter(user=user).count()
+    """Возвращает общее количество букетов в корзине пользователя."""
+    key = cart_count_cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Cart.objects.filter(user=user).aggregate(total=Sum('quantity'))['total'] or 0
+        cache.set(key, count, CART_COUNT_TIMEOUT)
+    return count
+
+def invalidate_cart_item_count(user):
+    """Сбрасывает счетчик после изменения корзины: следующий показ пересчитает его."""
+    cache.delete(cart_count_cache_key(user.pk))
 
 def cart_item_count(request):
     """Добавляет количество товаров в корзине в контекст шаблонов."""
     if request.user.is_authenticated:
-        return {'cart_item_count': get_cart_item_count(request.user)}
-    return {'cart_item_count': 0}
\ No newline at end of file
+        # Считаем только если шаблон действительно выводит счетчик
+        return {'cart_item_count': SimpleLazyObject(lambda: get_cart_item_count(request.user))}
+    return {'cart_item_count': 0}
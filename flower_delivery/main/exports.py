@@ -0,0 +1,138 @@
+#
+# Выгрузка заказов для бухгалтерии (CSV, при установленном openpyxl - еще и XLSX)
+# -------------------------------------------------------
+# Заказы читаются из базы порциями (.iterator(chunk_size=...)), строки CSV сразу уходят клиенту
+# через StreamingHttpResponse: память не растет с числом заказов, а первые байты отправляются
+# до того, как прочитан весь период.
+# Под ASGI Django собирает синхронный итератор в список целиком, прежде чем отправить, поэтому там
+# ответ получает асинхронный итератор (async_chunks): порции строк читаются из базы через sync_to_async.
+# Адрес, открытку, подпись и имя пользователя вводят покупатели: текст, начинающийся с "=", "+", "-" или "@",
+# Excel выполнил бы как формулу (CSV injection), поэтому такие ячейки выгружаются как текст.
+#
+
+import csv
+import tempfile
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.utils import timezone
+from .models import Order, Product
+from .utils import STATUS_TRANSLATION
+
+try:
+    import openpyxl  # Необязательная зависимость: без нее доступен только CSV
+except ImportError:
+    openpyxl = None
+
+
+EXPORT_CHUNK_SIZE = 2000  # Заказов за одну выборку из базы
+ASYNC_BATCH = 100  # Строк CSV за один переход в синхронный поток (под ASGI)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")  # С чего Excel начинает формулу
+EXPORT_COLUMNS = [
+    "Номер заказа", "Дата", "Пользователь", "Букет", "Сумма, руб.", "Статус",
+    "Адрес доставки", "Текст на открытке", "Подпись",
+]
+
+
+def xlsx_available():
+    return openpyxl is not None
+
+
+def export_queryset(start=None, end=None, status=None):
+    """
+    Заказы для выгрузки: created_at в [start, end) (по индексу), при необходимости - один статус.
+    Букеты подгружаются prefetch-запросом на каждую порцию iterator().
+    """
+    orders = Order.objects.select_related("user").prefetch_related(
+        Prefetch("products", queryset=Product.objects.only("id", "name").order_by("id"))
+    )
+    if start is not None:
+        orders = orders.filter(created_at__gte=start)
+    if end is not None:
+        orders = orders.filter(created_at__lt=end)
+    if status:
+        orders = orders.filter(status=status)
+    return orders.order_by("created_at", "id")
+
+
+def order_rows(orders):
+    """Строки выгрузки по одной на заказ (генератор)"""
+    for order in orders.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            order.id,
+            timezone.localtime(order.created_at).strftime("%d.%m.%Y %H:%M"),
+            order.user.username,
+            ", ".join(product.name for product in order.products.all()) or "Не указан",
+            order.total_price,
+            STATUS_TRANSLATION.get(order.status, order.status),
+            order.address,
+            order.card_text,
+            order.signature,
+        ]
+
+
+def is_formula(value):
+    return isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+
+
+def csv_safe(value):
+    """Ячейка CSV, которую Excel покажет как текст: апостроф перед формулой Excel не выводит"""
+    return "'" + value if is_formula(value) else value
+
+
+class Echo:
+    """Псевдофайл для csv.writer: writerow возвращает готовую строку вместо записи в буфер"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(orders):
+    """
+    Генератор частей CSV-файла. Заголовок отдается до первого запроса к базе.
+    BOM в начале - чтобы Excel открыл кириллицу в UTF-8 без настройки импорта.
+    """
+    writer = csv.writer(Echo(), delimiter=";")  # ";" - разделитель, который Excel ждет в русской локали
+    yield "﻿" + writer.writerow(EXPORT_COLUMNS)
+    for row in order_rows(orders):
+        yield writer.writerow([csv_safe(value) for value in row])
+
+
+def text_cell(sheet, value):
+    """Строка с "=" openpyxl записал бы формулой - явно помечаем ячейку как текст"""
+    cell = openpyxl.cell.WriteOnlyCell(sheet, value=value)
+    cell.data_type = "s"
+    return cell
+
+
+def _take(chunks, count):
+    return "".join(islice(chunks, count))
+
+
+async def async_chunks(chunks, batch=ASYNC_BATCH):
+    """
+    Асинхронная обертка над генератором частей файла (для StreamingHttpResponse под ASGI).
+    Генератор читает базу, поэтому продвигается в потоке синхронного кода Django (sync_to_async),
+    по batch частей за раз - чтобы не переключаться между потоками на каждой строке.
+    """
+    chunks = iter(chunks)
+    while part := await sync_to_async(_take)(chunks, batch):
+        yield part
+
+
+def write_xlsx(orders):
+    """
+    XLSX в режиме write_only: строки сразу сбрасываются во временный файл, а не копятся в памяти.
+    Формат ZIP нельзя отдавать по мере записи, поэтому клиент получает файл целиком после сборки.
+    :return: открытый временный файл (удаляется при закрытии)
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Заказы")
+    sheet.append(EXPORT_COLUMNS)
+    for row in order_rows(orders):
+        sheet.append([text_cell(sheet, value) if is_formula(value) else value for value in row])
+
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
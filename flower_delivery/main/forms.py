@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth.models import User
-from .models import Review
+from .models import Order, Review
 
 
 # Форма для регистрации
@@ -46,4 +46,60 @@ class ReviewForm(forms.ModelForm):
 
     class Meta:
         model = Review
-        fields = ["rating", "text"]
\ No newline at end of file
+        fields = ["rating", "text"]
+
+
+# Фильтр и сортировка каталога (параметры GET-запроса)
+class CatalogFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ("", "По умолчанию"),
+        ("price", "Сначала дешевле"),
+        ("-price", "Сначала дороже"),
+        ("popular", "Популярные"),
+        ("rating", "По рейтингу"),
+    ]
+
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES, required=False, label="Сортировка",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    min_price = forms.DecimalField(
+        min_value=0, max_digits=10, decimal_places=2, required=False, label="Цена от",
+        widget=forms.NumberInput(attrs={"class": "form-control", "placeholder": "от"}),
+    )
+    max_price = forms.DecimalField(
+        min_value=0, max_digits=10, decimal_places=2, required=False, label="Цена до",
+        widget=forms.NumberInput(attrs={"class": "form-control", "placeholder": "до"}),
+    )
+
+
+# Параметры выгрузки заказов для администратора
+class OrderExportForm(forms.Form):
+    date_from = forms.DateField(
+        required=False, label="С даты",
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+    date_to = forms.DateField(
+        required=False, label="По дату (включительно)",
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+    )
+    status = forms.ChoiceField(
+        choices=[("", "Все статусы")] + Order.STATUS_CHOICES, required=False, label="Статус",
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    file_format = forms.ChoiceField(
+        choices=[("csv", "CSV")], required=False, label="Формат",  # По умолчанию - CSV
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def __init__(self, *args, xlsx=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        if xlsx:
+            self.fields["file_format"].choices = [("csv", "CSV"), ("xlsx", "Excel (XLSX)")]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get("date_from"), cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Начальная дата позже конечной.")
+        return cleaned_data
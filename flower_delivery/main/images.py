@@ -0,0 +1,121 @@
+#
+# Уменьшенные копии изображений букетов
+# -------------------------------------------------------
+# Из загруженного Product.image делаются копии нескольких ширин в WebP и JPEG (для старых браузеров).
+# Копии лежат рядом с оригиналом, в имени - хэш содержимого оригинала: products/roses.3f2a9c1b0d4e.640w.webp.
+# Такие файлы никогда не меняются под тем же именем, поэтому их можно кэшировать навсегда.
+# Работа идет в фоновом пуле потоков после коммита транзакции, а не во время запроса.
+# Для уже загруженных букетов: python manage.py build_renditions
+#
+
+import hashlib
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from .models import Product
+from .catalog_cache import bump_catalog_version
+
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960, 1280)  # Ширины копий в пикселях
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "jpeg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+WORKERS = 2  # Потоков для обработки изображений в процессе сайта
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def rendition_widths(original_width):
+    """Ширины копий: все стандартные меньше оригинала плюс сам оригинал (не больше максимальной)"""
+    widths = [width for width in WIDTHS if width < original_width]
+    widths.append(min(original_width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def _to_rgb(image):
+    """JPEG не поддерживает прозрачность - подкладываем белый фон"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_renditions(image_name, storage=default_storage):
+    """
+    Создает копии изображения и сохраняет их в хранилище. Базу не трогает - можно вызывать из любых потоков.
+    :return: словарь для Product.renditions
+    """
+    with storage.open(image_name, "rb") as file:
+        data = file.read()
+
+    digest = content_hash(data)
+    stem = posixpath.splitext(image_name)[0]
+    renditions = {"source": image_name, "hash": digest}
+
+    with Image.open(BytesIO(data)) as original:
+        original = _to_rgb(ImageOps.exif_transpose(original))
+        for width in rendition_widths(original.width):
+            height = max(1, round(original.height * width / original.width))
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for image_format, options in FORMATS.items():
+                name = f"{stem}.{digest}.{width}w.{image_format}"
+                if not storage.exists(name):  # Имя зависит от содержимого: готовый файл не пересоздаем
+                    buffer = BytesIO()
+                    resized.save(buffer, **options)
+                    storage.save(name, ContentFile(buffer.getvalue()))
+                renditions.setdefault(image_format, {})[str(width)] = name
+    return renditions
+
+
+def save_renditions(product_id, renditions):
+    """
+    Записывает готовые копии в букет, если за время обработки изображение не заменили.
+    Сигналы не вызываются (UPDATE), поэтому версию каталога обновляем сами.
+    Прежние копии не удаляем: их может использовать другой букет с тем же изображением.
+    """
+    updated = Product.objects.filter(pk=product_id, image=renditions["source"]).update(renditions=renditions)
+    if updated:
+        bump_catalog_version()  # Страницы каталога должны получить srcset
+    return bool(updated)
+
+
+def build_renditions(product_id):
+    """Фоновая задача: копии для одного букета"""
+    close_old_connections()
+    try:
+        image_name = Product.objects.filter(pk=product_id).values_list("image", flat=True).first()
+        if image_name:
+            save_renditions(product_id, render_renditions(image_name))
+    except Exception:
+        logger.exception("Не удалось создать копии изображения букета #%s", product_id)
+    finally:
+        close_old_connections()
+
+
+def needs_renditions(product):
+    return bool(product.image) and product.renditions.get("source") != product.image.name
+
+
+def schedule_renditions(product_id):
+    """Ставит обработку изображения в фоновый пул потоков"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="renditions")
+    return _executor.submit(build_renditions, product_id)
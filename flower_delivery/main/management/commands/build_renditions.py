@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from main.images import WORKERS, needs_renditions, render_renditions, save_renditions
+from main.models import Product
+
+
+class Command(BaseCommand):
+    help = "Создает уменьшенные копии изображений (WebP и JPEG) для букетов, у которых их еще нет"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Пересоздать копии для всех букетов")
+        parser.add_argument("--workers", type=int, default=WORKERS, help="Сколько изображений обрабатывать параллельно")
+
+    def handle(self, *args, **options):
+        products = [
+            product for product in Product.objects.only("id", "image", "renditions")
+            if product.image and (options["force"] or needs_renditions(product))
+        ]
+        if not products:
+            self.stdout.write("Все копии изображений уже созданы.")
+            return
+
+        # Изображения обрабатываются в пуле потоков, запись в базу - здесь, в основном потоке
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [(product, pool.submit(render_renditions, product.image.name)) for product in products]
+            for product, future in futures:
+                try:
+                    save_renditions(product.id, future.result())
+                except Exception as error:
+                    self.stderr.write(f"{product.name}: {error}")
+                else:
+                    self.stdout.write(f"{product.name}: готово")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from main.notifications import BATCH_SIZE, dispatch_batch
+from main.telegram_api import get_client
+
+
+class Command(BaseCommand):
+    help = "Отправляет накопленные уведомления из очереди в Telegram (с повторными попытками)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Обработать очередь один раз и завершиться")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Сколько сообщений отправлять за проход")
+        parser.add_argument("--interval", type=float, default=1.0, help="Пауза между проходами, если очередь пуста (сек.)")
+
+    def handle(self, *args, **options):
+        client = get_client()  # Пул соединений и лимиты Telegram на весь процесс
+
+        while True:
+            processed = dispatch_batch(client=client, batch_size=options["batch_size"])
+            if processed:
+                self.stdout.write(f"Обработано уведомлений: {processed}")
+
+            if processed < options["batch_size"]:  # Очередь разобрана
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from main.popularity import recalculate_sold_counts
+from main.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает ежедневную сводку продаж и счетчики продаж букетов с нуля по таблице заказов"
+
+    def handle(self, *args, **options):
+        rows = rebuild_daily_sales()
+        self.stdout.write(self.style.SUCCESS(f"Сводка продаж пересчитана: {rows} строк(и)."))
+        recalculate_sold_counts()
+        self.stdout.write(self.style.SUCCESS("Счетчики продаж букетов пересчитаны."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from main.search import ensure_search_index, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Пересобирает поисковый индекс каталога (после массовых правок букетов в обход сигналов)"
+
+    def handle(self, *args, **options):
+        ensure_search_index()
+        rebuild_search_index()
+        self.stdout.write("Поисковый индекс пересобран.")
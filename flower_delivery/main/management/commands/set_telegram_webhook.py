@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from main.telegram_api import get_client
+
+
+class Command(BaseCommand):
+    help = "Регистрирует webhook Telegram-бота на сайте (или удаляет его, чтобы вернуться к polling)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Публичный адрес webhook (по умолчанию SITE_URL + /telegram/webhook/)")
+        parser.add_argument("--delete", action="store_true", help="Удалить webhook и вернуться к long polling")
+
+    def handle(self, *args, **options):
+        client = get_client()
+
+        if options["delete"]:
+            client.call("deleteWebhook")
+            self.stdout.write("Webhook удален. Запустите python telegram_bot.py для работы через polling.")
+            return
+
+        if not settings.TELEGRAM_WEBHOOK_SECRET:
+            raise CommandError("Укажите TELEGRAM_WEBHOOK_SECRET в .env - без него сайт не принимает обновления")
+
+        url = options["url"] or settings.SITE_URL.rstrip("/") + reverse("telegram_webhook")
+        client.call(
+            "setWebhook",
+            url=url,
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET,
+            allowed_updates=["message", "callback_query"],
+        )
+        self.stdout.write(f"Webhook установлен: {url}")
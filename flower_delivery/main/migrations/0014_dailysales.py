@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rebuild_daily_sales(apps, schema_editor):
+    """Заполняет сводку по уже оформленным заказам"""
+    from django.db.models import Count, OuterRef, Subquery, Sum
+    from django.db.models.functions import TruncDate
+
+    Order = apps.get_model('main', 'Order')
+    DailySales = apps.get_model('main', 'DailySales')
+
+    first_product = (
+        Order.products.through.objects.filter(order_id=OuterRef('pk'))
+        .order_by('product_id')
+        .values('product_id')[:1]
+    )
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'), product_key=Subquery(first_product))
+        .values('day', 'status', 'product_key')
+        .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+        .order_by()
+    )
+    DailySales.objects.bulk_create(
+        DailySales(
+            day=row['day'],
+            status=row['status'],
+            product_id=row['product_key'],
+            order_count=row['order_count'],
+            revenue=row['revenue'] or 0,
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_review_order_alter_review_rating_alter_review_text_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('accepted', 'Принят'), ('assembling', 'В сборке'), ('on_the_way', 'В пути'), ('delivered', 'Доставлен')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.product')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'product'), name='unique_daily_sales')],
+            },
+        ),
+        migrations.RunPython(rebuild_daily_sales, migrations.RunPython.noop),
+    ]
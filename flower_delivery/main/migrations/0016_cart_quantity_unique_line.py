@@ -0,0 +1,42 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Объединяет одинаковые строки корзины в одну с количеством"""
+    from django.db.models import Count, Min, Sum
+
+    Cart = apps.get_model('main', 'Cart')
+    fields = ('user', 'product', 'address', 'card_text', 'signature')
+
+    duplicates = (
+        Cart.objects.values(*fields)
+        .annotate(lines=Count('id'), keep_id=Min('id'), total=Sum('quantity'))
+        .filter(lines__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        lines = Cart.objects.filter(**{field: group[field] for field in fields})
+        lines.exclude(id=group['keep_id']).delete()
+        Cart.objects.filter(id=group['keep_id']).update(quantity=group['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'product', 'address', 'card_text', 'signature'), name='unique_cart_line'),
+        ),
+    ]
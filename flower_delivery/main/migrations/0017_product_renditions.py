@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_cart_quantity_unique_line'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
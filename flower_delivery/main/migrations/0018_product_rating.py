@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+def fill_ratings(apps, schema_editor):
+    """Считает рейтинг по уже оставленным отзывам"""
+    from django.db.models import Avg, Count, Sum
+
+    Product = apps.get_model('main', 'Product')
+    Review = apps.get_model('main', 'Review')
+
+    rows = Review.objects.values('product').annotate(total=Sum('rating'), count=Count('id'), avg=Avg('rating')).order_by()
+    for row in rows:
+        Product.objects.filter(pk=row['product']).update(
+            rating_sum=row['total'], rating_count=row['count'], rating_avg=row['avg'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_product_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
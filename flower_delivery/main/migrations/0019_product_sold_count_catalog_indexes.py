@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+def fill_sold_counts(apps, schema_editor):
+    """Считает, сколько раз уже заказывали каждый букет"""
+    from django.db.models import Count
+
+    Product = apps.get_model('main', 'Product')
+    Order = apps.get_model('main', 'Order')
+
+    rows = Order.products.through.objects.values('product_id').annotate(total=Count('id')).order_by()
+    for row in rows:
+        Product.objects.filter(pk=row['product_id']).update(sold_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_product_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sold_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_sold_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['sold_count', 'id'], name='product_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating_avg', 'rating_count', 'id'], name='product_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+USER_CHAT_INDEX = 'auth_user_telegram_chat_id_idx'
+
+
+def add_user_chat_index(apps, schema_editor):
+    """
+    Индекс на auth_user.telegram_chat_id. Поле добавлено в User через add_to_class, у него нет своей
+    миграции в приложении main, поэтому создаем индекс SQL-запросом - если колонка уже есть в базе.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = [column.name for column in connection.introspection.get_table_description(cursor, 'auth_user')]
+    if 'telegram_chat_id' in columns:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {USER_CHAT_INDEX} ON auth_user (telegram_chat_id)'
+        )
+
+
+def remove_user_chat_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {USER_CHAT_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_product_sold_count_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.RunPython(add_user_chat_index, remove_user_chat_index),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='cart',
+            name='unique_cart_line',
+        ),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('product'), django.db.models.functions.text.MD5('address'), django.db.models.functions.text.MD5('card_text'), models.F('signature'), name='unique_cart_line'),
+        ),
+    ]
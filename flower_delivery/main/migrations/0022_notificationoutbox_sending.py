@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_cart_unique_line_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=20),
+        ),
+    ]
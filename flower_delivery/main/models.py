@@ -1,11 +1,15 @@
 from django.db import models
+from django.db.models.functions import MD5
 from django.contrib.auth.models import User, AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.core.files.storage import default_storage
 
 
 
 # Расширяем стандартную модель User
-User.add_to_class('telegram_chat_id', models.CharField(max_length=50, blank=True, null=True))
+# Индекс: бот ищет пользователя по чату на каждое сообщение (в базе его создает миграция 0020)
+User.add_to_class('telegram_chat_id', models.CharField(max_length=50, blank=True, null=True, db_index=True))
 
 
 # Модель товара (букета)
@@ -14,13 +18,42 @@ class Product(models.Model):
     description = models.TextField(blank=True)  # Описание
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Цена
     image = models.ImageField(upload_to='products/')  # Изображение букета
+    # Уменьшенные копии изображения (создаются в фоне, см. main/images.py):
+    # {"source": имя оригинала, "jpeg": {ширина: файл}, "webp": {ширина: файл}}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Рейтинг по отзывам: обновляется сигналами при добавлении и удалении отзыва (см. main/ratings.py)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)  # Сумма оценок
+    rating_count = models.PositiveIntegerField(default=0, editable=False)  # Количество отзывов
+    rating_avg = models.FloatField(default=0, editable=False)  # Средняя оценка
+    # Популярность: сколько раз букет заказывали (обновляется вместе с заказами, см. main/popularity.py)
+    sold_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
+    def _srcset(self, image_format):
+        files = self.renditions.get(image_format, {}) if self.renditions.get("source") == self.image.name else {}
+        return ", ".join(f"{default_storage.url(name)} {width}w" for width, name in sorted(files.items(), key=lambda item: int(item[0])))
+
+    @property
+    def webp_srcset(self):
+        """srcset из WebP-копий (пусто, пока копии не готовы)"""
+        return self._srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        """srcset из JPEG-копий для браузеров без WebP"""
+        return self._srcset("jpeg")
+
     class Meta:
         verbose_name = "Товар"  # Название модели в единственном числе
         verbose_name_plural = "Товары"  # Название модели во множественном числе
+        # Индексы под сортировки каталога (см. CATALOG_ORDERINGS во views.py): id в конце - для постраничного вывода по ключу
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['sold_count', 'id'], name='product_popular_idx'),
+            models.Index(fields=['rating_avg', 'rating_count', 'id'], name='product_rating_idx'),
+        ]
 
 
 # Модель заказа
@@ -45,9 +78,33 @@ class Order(models.Model):
     def __str__(self):
         return f"Заказ #{self.id} - {self.user}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()  # Запоминаем значения из базы, чтобы отслеживать изменения
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_loaded_values()  # Сигналы post_save уже отработали и видели прежние значения
+
+    def remember_loaded_values(self):
+        """Сохраняет текущие статус и цену как последние записанные в базу"""
+        self._loaded_status = self.__dict__.get('status')
+        self._loaded_total_price = self.__dict__.get('total_price')
+
+    def status_changed(self):
+        """Изменился ли статус по сравнению с сохраненным в базе (для нового заказа - всегда да)"""
+        return getattr(self, '_loaded_status', None) != self.status
+
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),  # "Мои заказы" на сайте и в боте
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),  # Фильтр по статусу в админке
+            models.Index(fields=['created_at'], name='order_created_idx'),  # Выборки за период
+        ]
 
 
 # Модель отзыва
@@ -64,6 +121,20 @@ class Review(models.Model):
     def __str__(self):
         return f"Отзыв от {self.user.username} - {self.rating} ⭐"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_loaded_values()  # Запоминаем букет из базы: отзыв могут перенести на другой
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.remember_loaded_values()
+
+    def remember_loaded_values(self):
+        """Сохраняет текущий букет как последний записанный в базу"""
+        self._loaded_product_id = self.__dict__.get('product_id')
+
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
@@ -77,6 +148,69 @@ class Cart(models.Model):
     address = models.TextField(blank=True, default="")  # Адрес доставки
     card_text = models.TextField(blank=True, default="")  # Текст на открытке
     signature = models.CharField(max_length=255, blank=True, default="")  # Подпись
+    quantity = models.PositiveIntegerField(default=1)  # Сколько одинаковых букетов (каждый станет отдельным заказом)
+
+    # Поля, по которым одинаковые букеты объединяются в одну строку корзины
+    LINE_FIELDS = ('user', 'product', 'address', 'card_text', 'signature')
+
+    def __str__(self):
+        return f"{self.product.name} для {self.user.username}"
+
+    class Meta:
+        constraints = [
+            # Длинные тексты входят в индекс хешем: строка B-tree индекса PostgreSQL ограничена ~2.7 КБ
+            models.UniqueConstraint(
+                'user', 'product', MD5('address'), MD5('card_text'), 'signature', name='unique_cart_line',
+            ),
+        ]
+
+
+# Ежедневная сводка продаж: день × статус × букет (поддерживается инкрементально)
+class DailySales(models.Model):
+    day = models.DateField()  # День оформления заказа
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)  # Статус заказа
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, blank=True, null=True)  # Букет (первый в заказе)
+    order_count = models.IntegerField(default=0)  # Количество заказов
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Выручка
 
     def __str__(self):
-        return f"{self.product.name} для {self.user.username}"
\ No newline at end of file
+        return f"{self.day} - {self.status} - {self.product}: {self.order_count}"
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status', 'product'], name='unique_daily_sales'),
+        ]
+
+
+# Исходящие уведомления в Telegram (outbox): пишутся в одной транзакции с заказом,
+# отправляются отдельным процессом - командой dispatch_notifications
+class NotificationOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+
+    chat_id = models.CharField(max_length=50)  # Telegram ID получателя
+    text = models.TextField()  # Текст сообщения
+    parse_mode = models.CharField(max_length=20, blank=True, default='Markdown')  # Разметка сообщения
+    reply_markup = models.JSONField(blank=True, null=True)  # Кнопки под сообщением
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')  # Статус отправки
+    attempts = models.PositiveIntegerField(default=0)  # Количество попыток отправки
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Когда можно пробовать снова
+    last_error = models.TextField(blank=True, default='')  # Последняя ошибка
+    created_at = models.DateTimeField(auto_now_add=True)  # Дата постановки в очередь
+    sent_at = models.DateTimeField(blank=True, null=True)  # Дата отправки
+
+    def __str__(self):
+        return f"Уведомление #{self.id} для {self.chat_id} ({self.status})"
+
+    class Meta:
+        verbose_name = "Исходящее уведомление"
+        verbose_name_plural = "Исходящие уведомления"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
@@ -0,0 +1,131 @@
+#
+# Очередь исходящих уведомлений в Telegram (outbox)
+# -------------------------------------------------------
+# Сайт только записывает сообщения в таблицу NotificationOutbox - в той же транзакции, что и заказ.
+# Отправкой занимается отдельный процесс: python manage.py dispatch_notifications
+# Диспетчер сначала забирает пачку сообщений (статус "Отправляется" до CLAIM_TIMEOUT), поэтому параллельные
+# процессы не отправляют одно и то же. Результат каждого сообщения записывается сразу после отправки:
+# после сбоя процесса повторно уйдет разве что сообщение, которое отправлялось в момент сбоя.
+#
+
+import logging
+from datetime import timedelta
+import requests
+from django.db import transaction
+from django.utils import timezone
+from .models import NotificationOutbox
+from .telegram_api import TelegramAPIError, get_client
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50  # Сколько сообщений забираем за один проход
+MAX_ATTEMPTS = 8  # После стольких неудачных попыток сообщение помечается как "Ошибка"
+BACKOFF_BASE = 5  # Задержка перед первой повторной попыткой, в секундах
+BACKOFF_MAX = 60 * 60  # Максимальная задержка между попытками, в секундах
+CLAIM_TIMEOUT = timedelta(minutes=5)  # Через сколько забранное, но не отправленное сообщение вернется в очередь
+
+
+def enqueue_telegram_message(chat_id, text, reply_markup=None, parse_mode="Markdown"):
+    """Ставит сообщение в очередь на отправку. Сеть не используется."""
+    return NotificationOutbox.objects.create(
+        chat_id=str(chat_id),
+        text=text,
+        reply_markup=reply_markup,
+        parse_mode=parse_mode,
+    )
+
+
+def enqueue_telegram_messages(chat_id, texts, parse_mode="Markdown"):
+    """Ставит в очередь несколько сообщений одному получателю одним запросом к базе"""
+    return NotificationOutbox.objects.bulk_create(
+        NotificationOutbox(chat_id=str(chat_id), text=text, parse_mode=parse_mode) for text in texts
+    )
+
+
+def enqueue_telegram_batch(messages, parse_mode="Markdown"):
+    """
+    Ставит в очередь сообщения разным получателям одним запросом к базе.
+    :param messages: список (chat_id, текст, reply_markup или None)
+    """
+    return NotificationOutbox.objects.bulk_create(
+        NotificationOutbox(chat_id=str(chat_id), text=text, reply_markup=reply_markup, parse_mode=parse_mode)
+        for chat_id, text, reply_markup in messages
+    )
+
+
+def backoff_delay(attempts):
+    """Экспоненциальная задержка перед следующей попыткой"""
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX))
+
+
+PERMANENT_ERRORS = (400, 403, 404)  # Ошибки, при которых повторять отправку бессмысленно (например, чат не найден)
+
+
+def send_outbox_message(message, client):
+    """Отправляет одно сообщение через общий клиент Telegram"""
+    client.send_message(
+        message.chat_id,
+        message.text,
+        parse_mode=message.parse_mode or None,
+        reply_markup=message.reply_markup,
+    )
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Забирает пачку сообщений, у которых подошло время попытки, и помечает их как отправляемые.
+    Строки, заблокированные другим диспетчером, пропускаются (SKIP LOCKED). Если диспетчер упал,
+    не отправив сообщение, через CLAIM_TIMEOUT его заберет следующий.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=('pending', 'sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if messages:
+            NotificationOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+                status='sending', next_attempt_at=now + CLAIM_TIMEOUT,
+            )
+    return messages
+
+
+def dispatch_batch(client=None, batch_size=BATCH_SIZE):
+    """
+    Отправляет очередную пачку сообщений, у которых подошло время попытки.
+    Частоту отправки ограничивает клиент (лимиты Telegram на бота и на чат).
+    :return: количество обработанных сообщений
+    """
+    client = client or get_client()
+    messages = claim_batch(batch_size)
+
+    for message in messages:
+        message.attempts += 1
+        message.status = 'pending'
+        message.next_attempt_at = timezone.now()
+        try:
+            send_outbox_message(message, client)
+        except (TelegramAPIError, requests.RequestException) as error:
+            message.last_error = str(error)
+            status_code = getattr(error, 'status_code', None)
+            if status_code in PERMANENT_ERRORS:
+                message.status = 'failed'
+                logger.warning("Уведомление #%s не может быть доставлено: %s", message.id, error)
+            elif message.attempts >= MAX_ATTEMPTS:
+                message.status = 'failed'
+                logger.error("Уведомление #%s не отправлено после %s попыток: %s", message.id, message.attempts, error)
+            else:
+                delay = backoff_delay(message.attempts)
+                retry_after = getattr(error, 'retry_after', None)  # Telegram сам сказал, когда можно повторить
+                if retry_after:
+                    delay = max(delay, timedelta(seconds=retry_after))
+                message.next_attempt_at = timezone.now() + delay
+        else:
+            message.status = 'sent'
+            message.sent_at = timezone.now()
+            message.last_error = ''
+        # Сразу записываем результат: при сбое на следующем сообщении это уже не отправится повторно
+        message.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return len(messages)
@@ -0,0 +1,80 @@
+#
+# Массовая смена статусов заказов (админка)
+# -------------------------------------------------------
+# Новые статусы записываются одним UPDATE ... SET status = CASE ... END, без save() и сигналов
+# для каждого заказа. Все, что обычно делают сигналы post_save, выполняется здесь пачкой:
+# сводка продаж - одним изменением, уведомления покупателям - одной вставкой в очередь outbox
+# (отправляет dispatch_notifications с соблюдением лимитов Telegram), кэш "Мои заказы" в боте - сбрасывается после коммита.
+#
+
+from collections import defaultdict
+from functools import partial
+from django.db import transaction
+from django.db.models import Case, CharField, Exists, OuterRef, Prefetch, Value, When
+from .bot_orders import invalidate_bot_orders
+from .models import Order, Product, Review
+from .notifications import enqueue_telegram_batch
+from .sales import move_orders
+from .utils import generate_order_message, generate_review_button, get_order_bouquet
+
+
+# Следующий статус заказа; у доставленного следующего нет
+NEXT_STATUS = {
+    "accepted": "assembling",
+    "assembling": "on_the_way",
+    "on_the_way": "delivered",
+}
+
+
+def change_statuses(new_statuses):
+    """
+    Переводит заказы в новые статусы.
+    :param new_statuses: словарь {id заказа: новый статус}
+    :return: список измененных заказов (уже с новыми статусами)
+    """
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=new_statuses)
+            .annotate(has_review=Exists(Review.objects.filter(order=OuterRef("pk"))))
+            .prefetch_related(Prefetch("products", queryset=Product.objects.only("id", "name")))
+        )
+        changed = [order for order in orders if order.status != new_statuses[order.pk]]
+        if not changed:
+            return []
+
+        # Один UPDATE на все заказы: CASE по группам с одинаковым новым статусом
+        ids_by_status = defaultdict(list)
+        for order in changed:
+            ids_by_status[new_statuses[order.pk]].append(order.pk)
+        Order.objects.filter(pk__in=[order.pk for order in changed]).update(status=Case(
+            *(When(pk__in=ids, then=Value(status)) for status, ids in ids_by_status.items()),
+            output_field=CharField(),
+        ))
+
+        moves = []
+        for order in changed:
+            old_status = order.status
+            order.status = new_statuses[order.pk]
+            order.remember_loaded_values()
+            bouquet = get_order_bouquet(order)
+            moves.append((order, old_status, bouquet.pk if bouquet else None))
+        move_orders(moves)  # UPDATE обходит сигналы - сводку меняем сами
+
+        # Те же уведомления, что отправил бы сигнал send_order_status_update, - одной вставкой
+        enqueue_telegram_batch(
+            (order.telegram_chat_id, generate_order_message(order), generate_review_button(order, order.has_review))
+            for order in changed
+            if order.telegram_chat_id and order.status != "accepted"
+        )
+
+    # После коммита (в том числе внешней транзакции админки): иначе бот закэширует страницу с прежними статусами
+    for user_id in {order.user_id for order in changed}:
+        transaction.on_commit(partial(invalidate_bot_orders, user_id))
+    return changed
+
+
+def advance_orders(queryset):
+    """Переводит заказы из queryset в следующий статус (доставленные не меняются)"""
+    rows = queryset.filter(status__in=NEXT_STATUS).values_list("pk", "status")
+    return change_statuses({pk: NEXT_STATUS[status] for pk, status in rows})
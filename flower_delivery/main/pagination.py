@@ -0,0 +1,164 @@
+#
+# Постраничный вывод по ключу (keyset pagination)
+# -------------------------------------------------------
+# Вместо OFFSET следующая страница начинается после последней записи предыдущей:
+# WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT n.
+# Скорость не зависит от номера страницы, а новые записи не сдвигают страницы.
+# Курсор - значения полей сортировки последней записи, упакованные в строку для URL.
+#
+
+import base64
+import datetime
+import json
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    """Курсор поврежден или не подходит к сортировке"""
+
+
+class KeysetPage:
+    """Одна страница: объекты и курсор следующей страницы (None, если это последняя)"""
+
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _field_names(ordering):
+    return [field.lstrip("-") for field in ordering]
+
+
+def _json_default(value):
+    # DjangoJSONEncoder обрезает время до миллисекунд - для курсора нужна точность до микросекунд
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Значение {value!r} нельзя сохранить в курсоре")
+
+
+def encode_cursor(obj, ordering):
+    """Курсор, указывающий на позицию сразу после obj"""
+    values = [getattr(obj, name) for name in _field_names(ordering)]
+    data = json.dumps(values, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, model, ordering):
+    """Разбирает курсор обратно в значения полей сортировки"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+        names = _field_names(ordering)
+        if not isinstance(values, list) or len(values) != len(names):
+            raise InvalidCursor(cursor)
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(names, values)]
+    except (ValueError, TypeError, ValidationError) as error:  # Например, курсор от другой сортировки
+        raise InvalidCursor(cursor) from error
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие "строго после позиции values" для сортировки ordering.
+    Для ("-created_at", "-id"): created_at < c OR (created_at = c AND id < i).
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Возвращает страницу queryset, отсортированного по ordering.
+    Последним полем сортировки должен быть уникальный ключ (обычно id), иначе записи могут потеряться.
+    Стоит одного запроса (плюс prefetch_related, если он задан у queryset).
+    :raises InvalidCursor: если курсор не удалось разобрать
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, queryset.model, ordering)))
+
+    objects = list(queryset[:page_size + 1])  # Лишняя запись показывает, есть ли следующая страница
+    next_cursor = None
+    if len(objects) > page_size:
+        objects = objects[:page_size]
+        next_cursor = encode_cursor(objects[-1], ordering)
+    return KeysetPage(objects, next_cursor, is_first=not cursor)
+
+
+# ---- Приблизительное число записей (для админки) ----
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator без COUNT(*) по всей большой таблице.
+    Без фильтров число записей берется из оценки базы (PostgreSQL: pg_class.reltuples,
+    SQLite: MAX(id) по первичному ключу). С фильтрами считаем точно: по числу записей админка
+    проверяет номер страницы, и заниженное число сделало бы последние страницы недоступными.
+    Оценка тоже может быть меньше настоящего числа, поэтому страницы за ней остаются доступны.
+    """
+
+    EXACT_LIMIT = 10_000  # До стольких записей считаем точно
+    is_estimate = False  # count - оценка, а не точное число
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return queryset.count()  # Фильтры админки (статус, даты) идут по индексам заказов
+
+        estimate = self._estimate(queryset)
+        if estimate is None or estimate <= self.EXACT_LIMIT:
+            return queryset.count()  # Таблица небольшая - точный COUNT дешев
+        self.is_estimate = True
+        return estimate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.is_estimate and int(number) > 1:
+                return int(number)  # За оценкой могут быть записи - страница просто окажется пустой
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def _estimate(self, queryset):
+        model = queryset.model
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+            elif model._meta.pk.get_internal_type() in ("AutoField", "BigAutoField"):
+                table, pk = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(model._meta.pk.column)
+                cursor.execute(f"SELECT MAX({pk}) FROM {table}")  # Поиск по индексу первичного ключа
+            else:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row and row[0] and row[0] > 0 else None
@@ -0,0 +1,39 @@
+#
+# Популярность букетов (сколько раз их заказывали)
+# -------------------------------------------------------
+# Product.sold_count меняется одним UPDATE при оформлении, изменении состава и удалении заказов,
+# поэтому каталог сортирует букеты по популярности по индексу, без подсчета заказов.
+# UPDATE не отправляет post_save, поэтому версию кэша страниц "Популярные" меняем здесь же (после коммита).
+#
+
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from .catalog_cache import bump_popular_version
+from .models import Order, Product
+
+
+def apply_sold_deltas(deltas):
+    """
+    Меняет счетчики продаж одним UPDATE.
+    :param deltas: словарь {id букета: изменение}
+    """
+    deltas = {product_id: delta for product_id, delta in Counter(deltas).items() if product_id is not None and delta}
+    if not deltas:
+        return
+    change = Case(*(When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()),
+                  default=Value(0), output_field=IntegerField())
+    Product.objects.filter(pk__in=deltas).update(sold_count=F('sold_count') + change)
+    transaction.on_commit(bump_popular_version)  # Изменилась только сортировка "Популярные"
+
+
+def recalculate_sold_counts(products=None):
+    """Пересчитывает счетчики с нуля по таблице заказов (после правок в обход сигналов)"""
+    products = Product.objects.all() if products is None else products
+    orders = (
+        Order.products.through.objects.filter(product_id=OuterRef('pk'))
+        .order_by().values('product_id').annotate(total=Count('id')).values('total')
+    )
+    products.update(sold_count=Coalesce(Subquery(orders), 0))
+    transaction.on_commit(bump_popular_version)
@@ -0,0 +1,38 @@
+#
+# Рейтинг букетов по отзывам
+# -------------------------------------------------------
+# Product хранит сумму оценок, количество отзывов и среднюю оценку.
+# При добавлении и удалении отзыва они меняются одним UPDATE, без пересчета таблицы отзывов,
+# поэтому каталог может показывать и сортировать букеты по рейтингу без агрегатов.
+#
+
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from .models import Product, Review
+
+
+def apply_rating_delta(product_id, rating_delta, count_delta):
+    """
+    Меняет рейтинг букета одним UPDATE. Все F() в нем берут значения до изменения,
+    поэтому средняя считается по уже обновленным сумме и количеству.
+    """
+    new_sum = F('rating_sum') + rating_delta
+    new_count = F('rating_count') + count_delta
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=Coalesce(Cast(new_sum, FloatField()) / NullIf(new_count, 0), Value(0.0)),
+    )
+
+
+def recalculate_ratings(products=None):
+    """Пересчитывает рейтинг с нуля (для правок через админку и заполнения после миграции)"""
+    products = Product.objects.all() if products is None else products
+    reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    rating_sum = Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0)
+    rating_count = Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')), 0)
+    products.update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating_avg=Coalesce(Cast(rating_sum, FloatField()) / NullIf(rating_count, 0), Value(0.0)),
+    )
@@ -1,47 +1,64 @@
-from main.models import Order, User
-from datetime import datetime, timedelta
+from main.models import Order, DailySales
+from main.sales import period_filter, report_periods
+from django.db.models import Count, Sum
 
 
 def generate_text_report():
     """Генерирует подробный текстовый отчет по заказам за все время и за выбранные периоды."""
-    today = datetime.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
+    periods = report_periods()
+    today = periods["today"][0]
 
-    # Все заказы
-    all_orders = Order.objects.all()
-    orders_today = all_orders.filter(created_at__date=today)
-    orders_week = all_orders.filter(created_at__date__gte=week_ago)
-    orders_month = all_orders.filter(created_at__date__gte=month_ago)
+    # Условия для периодов: полуоткрытые интервалы дней
+    is_today = period_filter(periods["today"])
+    is_week = period_filter(periods["week"])
+    is_month = period_filter(periods["month"])
 
-    # Подсчеты
-    total_orders_all_time = all_orders.count()
-    total_orders_today = orders_today.count()
-    total_orders_week = orders_week.count()
-    total_orders_month = orders_month.count()
+    # Подсчеты и выручка за все периоды одним запросом к сводке продаж
+    totals = DailySales.objects.aggregate(
+        total_orders_all_time=Sum("order_count"),
+        total_orders_today=Sum("order_count", filter=is_today),
+        total_orders_week=Sum("order_count", filter=is_week),
+        total_orders_month=Sum("order_count", filter=is_month),
+        revenue_all_time=Sum("revenue"),
+        revenue_today=Sum("revenue", filter=is_today),
+        revenue_week=Sum("revenue", filter=is_week),
+        revenue_month=Sum("revenue", filter=is_month),
+    )
+
+    total_orders_all_time = totals["total_orders_all_time"] or 0
+    total_orders_today = totals["total_orders_today"] or 0
+    total_orders_week = totals["total_orders_week"] or 0
+    total_orders_month = totals["total_orders_month"] or 0
 
-    revenue_today = sum(order.total_price for order in orders_today)
-    revenue_week = sum(order.total_price for order in orders_week)
-    revenue_month = sum(order.total_price for order in orders_month)
-    revenue_all_time = sum(order.total_price for order in all_orders)
+    revenue_today = totals["revenue_today"] or 0
+    revenue_week = totals["revenue_week"] or 0
+    revenue_month = totals["revenue_month"] or 0
+    revenue_all_time = totals["revenue_all_time"] or 0
 
     average_check = revenue_all_time / total_orders_all_time if total_orders_all_time > 0 else 0
 
     # Количество заказов по статусам (за все время)
-    status_counts = {status: all_orders.filter(status=status).count() for status in ["accepted", "assembling", "on_the_way", "delivered"]}
+    status_counts = dict.fromkeys(["accepted", "assembling", "on_the_way", "delivered"], 0)
+    for entry in DailySales.objects.values("status").annotate(count=Sum("order_count")).order_by():
+        status_counts[entry["status"]] = entry["count"]
 
-    # Количество заказов по пользователям (ТОП-5)
-    user_orders = {}
-    for user in User.objects.filter(order__in=all_orders).distinct():
-        user_orders[user.username] = all_orders.filter(user=user).count()
-    top_users = sorted(user_orders.items(), key=lambda x: x[1], reverse=True)[:5]  # ТОП-5 пользователей
+    # Количество заказов по пользователям (ТОП-5) - в сводке нет разреза по пользователям
+    top_users = [
+        (entry["user__username"], entry["total"])
+        for entry in Order.objects.values("user__username")
+        .annotate(total=Count("id"))
+        .order_by("-total", "user__username")[:5]
+    ]
 
     # Популярные букеты (ТОП-5)
-    bouquet_counts = {}
-    for order in all_orders:
-        for product in order.products.all():
-            bouquet_counts[product.name] = bouquet_counts.get(product.name, 0) + 1
-    top_bouquets = sorted(bouquet_counts.items(), key=lambda x: x[1], reverse=True)[:5]  # ТОП-5 букетов
+    top_bouquets = [
+        (entry["product__name"], entry["total"])
+        for entry in DailySales.objects.filter(product__isnull=False)
+        .values("product__name")
+        .annotate(total=Sum("order_count"))
+        .filter(total__gt=0)
+        .order_by("-total", "product__name")[:5]
+    ]
 
     # Формируем текст отчета
     report_content = (
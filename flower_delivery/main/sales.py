@@ -0,0 +1,186 @@
+#
+# Ежедневная сводка продаж (DailySales)
+# -------------------------------------------------------
+# Каждый заказ учитывается в одной строке сводки: день оформления × статус × первый букет заказа.
+# Строки меняются инкрементально при создании заказа, смене статуса, цены или букета,
+# поэтому отчетам не нужно перебирать таблицу заказов.
+#
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import DailySales, Order
+
+
+def sales_day(order):
+    """День заказа в часовом поясе проекта"""
+    return timezone.localdate(order.created_at)
+
+
+def local_day_start(day):
+    """Начало дня (полночь) в часовом поясе проекта"""
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def local_date_range(start_day, end_day):
+    """
+    Полуоткрытый интервал [начало start_day, начало end_day) в часовом поясе проекта.
+    Фильтр created_at__gte/__lt по нему использует индекс, в отличие от created_at__date.
+    Незаданная граница (None) остается None - интервал открыт с этой стороны.
+    """
+    return (
+        local_day_start(start_day) if start_day else None,
+        local_day_start(end_day) if end_day else None,
+    )
+
+
+def report_periods(today=None):
+    """
+    Периоды отчетов как полуоткрытые интервалы дней [с, по): сегодня, неделя, месяц.
+    "Сегодня" - по часовому поясу проекта, а не сервера.
+    """
+    today = today or timezone.localdate()
+    tomorrow = today + timedelta(days=1)
+    return {
+        "today": (today, tomorrow),
+        "week": (today - timedelta(days=7), tomorrow),
+        "month": (today - timedelta(days=30), tomorrow),
+    }
+
+
+def period_filter(period):
+    """Условие на строки сводки за период (start, end) - по индексу на day"""
+    start, end = period
+    return Q(day__gte=start, day__lt=end)
+
+
+def first_product_id(order):
+    """ID первого букета заказа (как в order.products.first())"""
+    return order.products.order_by('pk').values_list('pk', flat=True).first()
+
+
+def apply_sales_deltas(deltas):
+    """
+    Применяет изменения к сводке.
+    :param deltas: словарь {(день, статус, id букета): (количество, выручка)}
+    """
+    deltas = {key: value for key, value in deltas.items() if value[0] or value[1]}
+    if not deltas:
+        return
+
+    product_ids = {product_id for _, _, product_id in deltas if product_id is not None}
+    product_filter = Q(product_id__in=product_ids)
+    if any(product_id is None for _, _, product_id in deltas):
+        product_filter |= Q(product__isnull=True)
+
+    with transaction.atomic():
+        # select_for_update не блокирует строки, которых еще нет: две параллельные транзакции
+        # создали бы одну и ту же строку дня и одна упала бы на unique_daily_sales.
+        # Поэтому сначала вставляем строки с нулями (уже существующие пропускаются по конфликту),
+        # а затем блокируем их и меняем. Строки без букета уникальность не защищает (NULL) -
+        # их, как и раньше, создаем только если не нашли
+        DailySales.objects.bulk_create(
+            [DailySales(day=day, status=status, product_id=product_id)
+             for day, status, product_id in deltas if product_id is not None],
+            ignore_conflicts=True,
+        )
+        rows = DailySales.objects.select_for_update().filter(
+            product_filter,
+            day__in={day for day, _, _ in deltas},
+            status__in={status for _, status, _ in deltas},
+        )
+        existing = {(row.day, row.status, row.product_id): row for row in rows}
+
+        to_update, to_create = [], []
+        for key, (count, revenue) in deltas.items():
+            row = existing.get(key)
+            if row:
+                row.order_count += count
+                row.revenue += revenue
+                to_update.append(row)
+            else:
+                day, status, product_id = key
+                to_create.append(DailySales(
+                    day=day, status=status, product_id=product_id, order_count=count, revenue=revenue,
+                ))
+
+        if to_update:
+            DailySales.objects.bulk_update(to_update, ['order_count', 'revenue'])
+        if to_create:
+            DailySales.objects.bulk_create(to_create)
+
+
+def record_orders(orders, product_ids):
+    """
+    Добавляет в сводку новые заказы.
+    :param orders: список заказов
+    :param product_ids: словарь {id заказа: id первого букета}
+    """
+    deltas = defaultdict(lambda: (0, 0))
+    for order in orders:
+        key = (sales_day(order), order.status, product_ids.get(order.pk))
+        count, revenue = deltas[key]
+        deltas[key] = (count + 1, revenue + order.total_price)
+    apply_sales_deltas(deltas)
+
+
+def move_order(order, old_status, old_total_price, old_product_id, new_product_id):
+    """Переносит заказ из одной строки сводки в другую"""
+    day = sales_day(order)
+    deltas = defaultdict(lambda: (0, 0))
+
+    old_key = (day, old_status, old_product_id)
+    count, revenue = deltas[old_key]
+    deltas[old_key] = (count - 1, revenue - old_total_price)
+
+    new_key = (day, order.status, new_product_id)
+    count, revenue = deltas[new_key]
+    deltas[new_key] = (count + 1, revenue + order.total_price)
+
+    apply_sales_deltas(deltas)
+
+
+def move_orders(moves):
+    """
+    Переносит несколько заказов в новые статусы одним изменением сводки.
+    :param moves: список (заказ, прежний статус, id первого букета); новый статус - order.status
+    """
+    deltas = defaultdict(lambda: (0, 0))
+    for order, old_status, product_id in moves:
+        day = sales_day(order)
+        for key, sign in (((day, old_status, product_id), -1), ((day, order.status, product_id), 1)):
+            count, revenue = deltas[key]
+            deltas[key] = (count + sign, revenue + sign * order.total_price)
+    apply_sales_deltas(deltas)
+
+
+def rebuild_daily_sales():
+    """Пересчитывает сводку с нуля по таблице заказов. Возвращает число строк сводки."""
+    first_product = (
+        Order.products.through.objects.filter(order_id=OuterRef('pk'))
+        .order_by('product_id')
+        .values('product_id')[:1]
+    )
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'), product_key=Subquery(first_product))
+        .values('day', 'status', 'product_key')
+        .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        created = DailySales.objects.bulk_create(
+            DailySales(
+                day=row['day'],
+                status=row['status'],
+                product_id=row['product_key'],
+                order_count=row['order_count'],
+                revenue=row['revenue'] or 0,
+            )
+            for row in rows
+        )
+    return len(created)
@@ -0,0 +1,145 @@
+#
+# Полнотекстовый поиск по каталогу
+# -------------------------------------------------------
+# SQLite: виртуальная таблица FTS5 main_product_search (rowid = id букета) с основами слов
+# названия и описания. Таблицу создает обработчик post_migrate, синхронизируют сигналы Product
+# (save/delete), полностью пересобирает команда rebuild_search_index.
+# Основы слов получаем русским стеммером (main/stemmer.py), тем же - для запроса,
+# поэтому "розами" находит "Букет роз". Результаты ранжируются по bm25, название весит больше описания.
+#
+# PostgreSQL: to_tsvector('russian', ...) со встроенным стеммером и GIN-индекс по выражению -
+# индекс база обновляет сама, отдельная таблица и сигналы не нужны.
+#
+
+import re
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from .models import Product
+from .stemmer import stem
+
+
+SEARCH_TABLE = "main_product_search"
+SEARCH_LIMIT = 50  # Сколько результатов показываем
+NAME_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0  # Веса колонок для bm25
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+PG_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B')"
+)
+
+
+def is_postgresql():
+    return connection.vendor == "postgresql"
+
+
+def stem_text(text):
+    """Текст -> основы слов через пробел"""
+    return " ".join(stem(word) for word in WORD_RE.findall((text or "").lower()))
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Создает поисковую таблицу (SQLite) или индекс (PostgreSQL), если их еще нет.
+    Вызывается после migrate (сигнал post_migrate). Новую таблицу сразу заполняет.
+    """
+    db = connections[using]
+    if db.vendor == "postgresql":
+        with db.cursor() as cursor:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS main_product_search_idx ON main_product USING GIN (({PG_VECTOR}))")
+        return
+
+    if db.vendor != "sqlite":
+        return  # Для других баз поиск работает через icontains (см. search_products)
+
+    with db.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+        if cursor.fetchone():
+            return
+        # unicode61 без remove_diacritics: иначе "й" превратится в "и"
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} "
+            f"USING fts5(name, description, tokenize = 'unicode61 remove_diacritics 0')"
+        )
+    if using == DEFAULT_DB_ALIAS:
+        rebuild_search_index()
+
+
+def _uses_fts():
+    return connection.vendor == "sqlite"
+
+
+def index_products(products):
+    """Добавляет или обновляет букеты в поисковой таблице"""
+    if not _uses_fts():
+        return
+    rows = [(product.pk, stem_text(product.name), stem_text(product.description)) for product in products]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(f"INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", rows)
+
+
+def remove_product(product_id):
+    """Убирает букет из поисковой таблицы"""
+    if _uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [product_id])
+
+
+def rebuild_search_index():
+    """Пересобирает поисковую таблицу по всем букетам"""
+    if not _uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    index_products(Product.objects.only("id", "name", "description").iterator(chunk_size=500))
+
+
+def fts_query(query):
+    """
+    Запрос пользователя -> выражение MATCH: все слова обязательны, каждое - как префикс основы.
+    Слова берутся только из букв и цифр, поэтому синтаксис FTS5 из запроса не попадет.
+    """
+    terms = [stem(word) for word in WORD_RE.findall(query.lower())]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+def search_products(query, limit=SEARCH_LIMIT):
+    """
+    Букеты по запросу, от самых подходящих.
+    :return: список Product (два запроса: поиск id и загрузка букетов)
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    if is_postgresql():
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+        from django.db.models.expressions import RawSQL
+
+        search_query = SearchQuery(query, config="russian", search_type="websearch")
+        document = RawSQL(PG_VECTOR, [], output_field=SearchVectorField())  # То же выражение, что в индексе
+        return list(
+            Product.objects.annotate(document=document)
+            .filter(document=search_query)  # document @@ websearch_to_tsquery(...)
+            .annotate(rank=SearchRank(document, search_query))
+            .order_by("-rank", "id")[:limit]
+        )
+
+    if not _uses_fts():
+        from django.db.models import Q
+        return list(Product.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))[:limit])
+
+    match = fts_query(query)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, %s, %s) LIMIT %s",
+            [match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    products = Product.objects.in_bulk(ids)
+    return [products[product_id] for product_id in ids if product_id in products]
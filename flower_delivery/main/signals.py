@@ -1,18 +1,30 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.conf import settings
-import requests
-from .models import Order
-from main.utils import STATUS_TRANSLATION, generate_order_message, generate_review_button
+from .models import Order, Product, Review
+from main.catalog_cache import bump_catalog_version
+from main.images import needs_renditions, schedule_renditions
+from main.ratings import apply_rating_delta, recalculate_ratings
+from main.search import index_products, remove_product
+from main.popularity import apply_sold_deltas
+from main.bot_orders import invalidate_bot_orders
+from django.db import transaction
+from functools import partial
+from main.utils import generate_order_message, generate_review_button
+from main.notifications import enqueue_telegram_message
+from main.sales import sales_day, first_product_id, record_orders, move_order, apply_sales_deltas
 
 
 
 @receiver(post_save, sender=Order)
 def send_order_status_update(sender, instance, **kwargs):
-    """Отправляет сообщение в Telegram при изменении статуса заказа"""
+    """Ставит в очередь сообщение в Telegram при изменении статуса заказа"""
     if not instance.telegram_chat_id:
         return  # Если у пользователя нет Telegram, не отправляем сообщение
 
+    # Сохранение без смены статуса (привязка Telegram, правка адреса) - не повод для уведомления
+    if not instance.status_changed():
+        return
+
     # Исключаем статус "Принят"
     if instance.status == "accepted":
         return
@@ -23,17 +35,155 @@ def send_order_status_update(sender, instance, **kwargs):
     # Генерируем кнопку, если нужно
     reply_markup = generate_review_button(instance)
 
-    # Формируем payload для отправки сообщения
-    payload = {
-        "chat_id": instance.telegram_chat_id,
-        "text": message,
-        "parse_mode": "Markdown",
-    }
+    # Записываем сообщение в очередь - отправит процесс dispatch_notifications
+    enqueue_telegram_message(instance.telegram_chat_id, message, reply_markup=reply_markup)
+
+
+
+# ----------- Ежедневная сводка продаж ---------------------------------
+
+@receiver(post_save, sender=Order)
+def update_daily_sales(sender, instance, created, raw=False, **kwargs):
+    """Учитывает новый заказ или изменение статуса/цены в сводке продаж"""
+    if raw:
+        return  # Загрузка фикстур - сводку пересчитывает команда rebuild_daily_sales
+
+    if created:
+        record_orders([instance], {})  # Букеты привязываются позже, через products.set()
+    else:
+        old_status = getattr(instance, '_loaded_status', None)
+        old_total_price = getattr(instance, '_loaded_total_price', None)
+        if old_status is not None and (old_status != instance.status or old_total_price != instance.total_price):
+            product_id = first_product_id(instance)
+            move_order(instance, old_status, old_total_price, product_id, product_id)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_daily_sales_product(sender, instance, action, reverse, **kwargs):
+    """Переносит заказ в строку сводки нового букета при изменении состава заказа"""
+    if reverse:
+        return  # Изменения со стороны букета не отслеживаем - их исправит rebuild_daily_sales
+
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        instance._sales_product_id = first_product_id(instance)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        old_product_id = instance.__dict__.pop('_sales_product_id', None)
+        new_product_id = first_product_id(instance)
+        if old_product_id != new_product_id:
+            move_order(instance, instance.status, instance.total_price, old_product_id, new_product_id)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_from_daily_sales(sender, instance, **kwargs):
+    """Убирает удаляемый заказ из сводки продаж"""
+    key = (sales_day(instance), instance.status, first_product_id(instance))
+    apply_sales_deltas({key: (-1, -instance.total_price)})
+
+
+
+# ----------- Популярность букетов ---------------------------------
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_sold_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Букет добавлен в заказ или убран из него - меняем счетчик продаж"""
+    if action == 'pre_clear':
+        # После очистки связей уже не узнать, какие они были
+        related = instance.order_set if reverse else instance.products
+        instance._sold_clear_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set, sign = instance.__dict__.pop('_sold_clear_ids', []), -1
+    elif action in ('post_add', 'post_remove'):
+        sign = 1 if action == 'post_add' else -1
+    else:
+        return
+
+    if reverse:
+        apply_sold_deltas({instance.pk: sign * len(pk_set)})  # instance - букет, pk_set - заказы
+    else:
+        apply_sold_deltas({product_id: sign for product_id in pk_set})
+
+
+@receiver(pre_delete, sender=Order)
+def remove_from_sold_counts(sender, instance, **kwargs):
+    """Удаленный заказ больше не считается продажей его букетов"""
+    apply_sold_deltas({product_id: -1 for product_id in instance.products.values_list('pk', flat=True)})
+
 
-    if reply_markup:
-        payload["reply_markup"] = reply_markup
 
-    # Отправляем сообщение через Telegram API
-    telegram_url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-    response = requests.post(telegram_url, json=payload)
+# ----------- Версия каталога (HTTP-кэш страниц) ---------------------------------
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Букеты и отзывы изменились - закэшированные страницы каталога больше не актуальны"""
+    # После коммита: иначе запрос в промежутке закэширует старые данные уже под новой версией
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def create_image_renditions(sender, instance, raw=False, **kwargs):
+    """Новое изображение букета - после коммита делаем его уменьшенные копии в фоне"""
+    if not raw and needs_renditions(instance):
+        transaction.on_commit(partial(schedule_renditions, instance.pk))
+
+
+
+# ----------- Рейтинг букетов ---------------------------------
+
+@receiver(post_save, sender=Review)
+def add_review_to_rating(sender, instance, created, raw=False, **kwargs):
+    """Новый отзыв добавляет оценку к рейтингу букета"""
+    if raw:
+        return
+    if created:
+        apply_rating_delta(instance.product_id, instance.rating, 1)
+    else:
+        # Правка отзыва (например, в админке) - редкий случай, пересчитываем рейтинг букета целиком.
+        # Если отзыв перенесли на другой букет, пересчитываем и прежний - иначе оценка останется в нем
+        product_ids = {instance.product_id, getattr(instance, '_loaded_product_id', None)} - {None}
+        recalculate_ratings(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_rating(sender, instance, **kwargs):
+    """Удаленный отзыв убирает свою оценку из рейтинга"""
+    apply_rating_delta(instance.product_id, -instance.rating, -1)
+
+
+
+# ----------- Поисковый индекс каталога ---------------------------------
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Обновляет букет в поисковой таблице"""
+    if not raw:
+        index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Убирает удаленный букет из поиска"""
+    remove_product(instance.pk)
+
+
+
+# ----------- Кэш "Мои заказы" в боте ---------------------------------
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_bot_orders_cache(sender, instance, **kwargs):
+    """Заказ или отзыв пользователя изменился - его список заказов в боте нужно построить заново"""
+    # После коммита: иначе бот успеет построить страницу по старым данным и закэшировать ее под новой версией
+    transaction.on_commit(partial(invalidate_bot_orders, instance.user_id))
+
 
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_bot_orders_on_products(sender, instance, action, reverse, **kwargs):
+    """Изменился состав заказа (например, products.set() сразу после создания)"""
+    if not reverse and action.startswith('post_'):
+        transaction.on_commit(partial(invalidate_bot_orders, instance.user_id))
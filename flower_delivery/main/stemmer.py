@@ -0,0 +1,116 @@
+#
+# Стеммер для русского языка (алгоритм Snowball)
+# -------------------------------------------------------
+# Отрезает окончания, чтобы "розы", "розами" и "розовый" искались одинаково.
+# Нужен для поиска через SQLite FTS5: встроенный стеммер porter там только английский.
+# Описание алгоритма: https://snowballstem.org/algorithms/russian/stemmer.html
+#
+
+VOWELS = "аеиоуыэюя"
+
+PERFECTIVE_GERUND = (("в", "вши", "вшись"), ("ив", "ивши", "ившись", "ыв", "ывши", "ывшись"))
+ADJECTIVE = ("ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+             "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею")
+PARTICIPLE = (("ем", "нн", "вш", "ющ", "щ"), ("ивш", "ывш", "ующ"))
+REFLEXIVE = ("ся", "сь")
+VERB = (("ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "нно"),
+        ("ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил", "ыл", "им", "ым", "ен",
+         "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт", "ены", "ить", "ыть", "ишь", "ую", "ю"))
+NOUN = ("а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ей", "ой", "ий", "й",
+        "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я")
+DERIVATIONAL = ("ост", "ость")
+SUPERLATIVE = ("ейш", "ейше")
+
+
+def _regions(word):
+    """Начала областей RV и R2 (см. описание алгоритма)"""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _longest(word, endings):
+    """Самое длинное окончание из списка, на которое заканчивается слово"""
+    matches = [ending for ending in endings if word.endswith(ending)]
+    return max(matches, key=len) if matches else None
+
+
+def _remove_group(word, groups):
+    """
+    Удаляет самое длинное окончание из пары групп. Окончания первой группы удаляются,
+    только если перед ними "а" или "я" (сама буква остается).
+    :return: слово без окончания или None, если правило не сработало
+    """
+    first, second = groups
+    ending = _longest(word, first + second)
+    if ending is None:
+        return None
+    stem = word[:-len(ending)]
+    if ending in second or stem.endswith(("а", "я")):
+        return stem
+    return None
+
+
+def _remove(word, endings):
+    ending = _longest(word, endings)
+    return word[:-len(ending)] if ending else None
+
+
+def _remove_adjectival(word):
+    stem = _remove(word, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _remove_group(stem, PARTICIPLE)
+    return participle if participle is not None else stem
+
+
+def stem(word):
+    """Основа русского слова (слово в нижнем регистре)"""
+    word = word.lower().replace("ё", "е")
+    rv, r2 = _regions(word)
+    prefix, rest = word[:rv], word[rv:]  # Все изменения - только внутри RV
+
+    # Шаг 1: деепричастие, иначе возвратная частица и затем прилагательное, глагол или существительное
+    result = _remove_group(rest, PERFECTIVE_GERUND)
+    if result is None:
+        reflexive = _remove(rest, REFLEXIVE)
+        if reflexive is not None:
+            rest = reflexive
+        for remove in (_remove_adjectival, lambda part: _remove_group(part, VERB), lambda part: _remove(part, NOUN)):
+            result = remove(rest)
+            if result is not None:
+                break
+    if result is not None:
+        rest = result
+
+    # Шаг 2: конечное "и"
+    if rest.endswith("и"):
+        rest = rest[:-1]
+
+    # Шаг 3: словообразовательное окончание в R2
+    ending = _longest(rest, DERIVATIONAL)
+    if ending and len(prefix) + len(rest) - len(ending) >= r2:
+        rest = rest[:-len(ending)]
+
+    # Шаг 4: "нн" -> "н", превосходная степень, мягкий знак
+    if rest.endswith("нн"):
+        rest = rest[:-1]
+    else:
+        superlative = _remove(rest, SUPERLATIVE)
+        if superlative is not None:
+            rest = superlative[:-1] if superlative.endswith("нн") else superlative
+        elif rest.endswith("ь"):
+            rest = rest[:-1]
+
+    return prefix + rest
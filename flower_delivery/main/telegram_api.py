@@ -0,0 +1,221 @@
+#
+# Общий клиент Telegram Bot API
+# -------------------------------------------------------
+# Через него идут все исходящие запросы к Telegram: уведомления из очереди, ответы бота (telebot).
+# Клиент держит пул keep-alive соединений, ставит явные таймауты, соблюдает лимиты Telegram
+# (около 30 сообщений в секунду на бота и 1 сообщение в секунду в один чат)
+# и повторяет запрос после ответа 429, выждав retry_after.
+#
+
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30  # Сообщений в секунду на весь бот
+CHAT_RATE = 1  # Сообщений в секунду в один чат
+CONNECT_TIMEOUT = 3.05  # Таймаут установки соединения, в секундах
+READ_TIMEOUT = 10  # Таймаут ожидания ответа, в секундах
+POOL_SIZE = 10  # Сколько keep-alive соединений держим открытыми
+MAX_RETRIES = 3  # Сколько раз повторяем запрос после ответа 429
+MAX_RETRY_AFTER = 30  # Дольше этого внутри запроса не ждем - отдаем ошибку вызывающему коду
+
+
+class TelegramAPIError(Exception):
+    """Telegram вернул ошибку ("ok": false)"""
+
+    def __init__(self, status_code, description, retry_after=None):
+        super().__init__(f"{status_code}: {description}")
+        self.status_code = status_code
+        self.description = description
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = now  # До этого момента отправлять нельзя (после 429)
+
+    def reserve(self, now):
+        """Забирает токен (возможно, в долг) и возвращает, сколько секунд нужно подождать"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0, -self.tokens / self.rate, self.blocked_until - now)
+
+    def is_idle(self, now):
+        """Ведро полное - его можно забыть без потери информации"""
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimiter:
+    """Общий лимит на бота и отдельный лимит на каждый чат. Потокобезопасен."""
+
+    MAX_CHATS = 10000  # После стольких чатов удаляем ведра, которые давно не использовались
+
+    def __init__(self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.chat_rate = chat_rate
+        self.lock = threading.Lock()
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock())
+        self.chat_buckets = {}
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self.MAX_CHATS:
+                self.chat_buckets = {key: value for key, value in self.chat_buckets.items() if not value.is_idle(now)}
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1, now)
+        return bucket
+
+    def delay(self, chat_id):
+        """Резервирует место для сообщения в чат и возвращает необходимую паузу в секундах"""
+        with self.lock:
+            now = self.clock()
+            wait = self.global_bucket.reserve(now)
+            return max(wait, self._chat_bucket(str(chat_id), now).reserve(now))
+
+    def acquire(self, chat_id):
+        """Ждет, пока в чат можно будет отправить сообщение"""
+        wait = self.delay(chat_id)
+        if wait > 0:
+            self.sleep(wait)
+
+    def pause(self, chat_id, seconds):
+        """Запрещает отправку в чат на seconds секунд (ответ 429 с retry_after)"""
+        with self.lock:
+            now = self.clock()
+            bucket = self._chat_bucket(str(chat_id), now) if chat_id is not None else self.global_bucket
+            bucket.blocked_until = max(bucket.blocked_until, now + seconds)
+
+
+class TelegramClient:
+    """Клиент Bot API с пулом соединений, таймаутами и ограничением частоты"""
+
+    def __init__(self, token, api_url="https://api.telegram.org", limiter=None,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), pool_size=POOL_SIZE, max_retries=MAX_RETRIES):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.limiter = limiter or RateLimiter()
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def method_url(self, method):
+        return f"{self.api_url}/bot{self.token}/{method}"
+
+    def request(self, http_method, method, chat_id=None, timeout=None, **kwargs):
+        """
+        Выполняет HTTP-запрос к методу API и возвращает requests.Response.
+        Сообщения в чат (chat_id указан) проходят через ограничитель частоты.
+        """
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                self.limiter.acquire(chat_id)
+
+            response = self.session.request(http_method, self.method_url(method), timeout=timeout or self.timeout, **kwargs)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+
+            retry_after = self._retry_after(response)
+            if retry_after > MAX_RETRY_AFTER:
+                return response
+            logger.info("Telegram просит подождать %s с. перед %s", retry_after, method)
+            self.limiter.pause(chat_id, retry_after)
+            if chat_id is None:
+                time.sleep(retry_after)
+
+        return response
+
+    def call(self, method, files=None, request_timeout=None, **payload):
+        """Вызывает метод API и возвращает поле result ответа. При ошибке - TelegramAPIError."""
+        chat_id = payload.get("chat_id")
+        if files:
+            response = self.request("post", method, chat_id=chat_id, timeout=request_timeout, data=payload, files=files)
+        else:
+            response = self.request("post", method, chat_id=chat_id, timeout=request_timeout, json=payload)
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"ok": False, "description": response.text}
+
+        if not body.get("ok"):
+            retry_after = self._retry_after(response, body) if response.status_code == 429 else None
+            raise TelegramAPIError(response.status_code, body.get("description"), retry_after)
+        return body.get("result")
+
+    def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        """Отправляет текстовое сообщение"""
+        payload = {"chat_id": chat_id, "text": text}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+        return self.call("sendMessage", **payload)
+
+    def get_updates(self, offset=None, timeout=0):
+        """Long polling: ждет новые обновления до timeout секунд"""
+        return self.call(
+            "getUpdates", offset=offset, timeout=timeout,
+            request_timeout=(CONNECT_TIMEOUT, timeout + READ_TIMEOUT),  # Ответ придет не раньше чем через timeout
+        )
+
+    def telebot_sender(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Отправитель запросов для telebot (apihelper.CUSTOM_REQUEST_SENDER)"""
+        chat_id = params.get("chat_id") if params else None
+        return self.request(method, url.rsplit("/", 1)[-1], chat_id=chat_id, timeout=timeout,
+                            params=params, files=files, proxies=proxies)
+
+    @staticmethod
+    def _retry_after(response, body=None):
+        if body is None:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+        parameters = body.get("parameters") or {}
+        return parameters.get("retry_after") or int(response.headers.get("Retry-After", 1))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Общий на процесс клиент, настроенный из settings"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TelegramClient(settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_API_URL)
+        return _client
+
+
+def telebot_request_sender(*args, **kwargs):
+    """Направляет запросы telebot через общий клиент: apihelper.CUSTOM_REQUEST_SENDER = telebot_request_sender"""
+    return get_client().telebot_sender(*args, **kwargs)
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    """Пересоздаем клиент, если в тестах поменяли адрес API или токен"""
+    global _client
+    if setting in ("TELEGRAM_BOT_TOKEN", "TELEGRAM_API_URL"):
+        _client = None
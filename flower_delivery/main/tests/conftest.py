@@ -0,0 +1,49 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from main.bot_users import chat_user_cache
+from main.tests.fake_telegram import FakeTelegramServer
+
+
+@pytest.fixture
+def fake_telegram(settings):
+    """Поднимает локальный сервер Telegram и направляет на него все запросы к API"""
+    server = FakeTelegramServer().start()
+    settings.TELEGRAM_API_URL = server.url
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def process_cache():
+    """Тесты идут в одном процессе - кэш в памяти, чтобы не трогать файловый кэш проекта"""
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэши (счетчик корзины, пользователи бота) не должны переходить из теста в тест"""
+    cache.clear()
+    chat_user_cache.clear()
+    yield
+    cache.clear()
+    chat_user_cache.clear()
+
+
+@pytest.fixture
+def prefer_indexes(db):
+    """
+    На маленьких тестовых таблицах PostgreSQL выбирает полный просмотр, даже когда индекс есть.
+    Запрещаем его, чтобы EXPLAIN показал, какой индекс подходит запросу (в SQLite ничего не делаем).
+    :return: признак полного просмотра таблицы в тексте плана
+    """
+    if connection.vendor != "postgresql":
+        yield "SCAN main_"
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+    yield "Seq Scan"
+    with connection.cursor() as cursor:
+        cursor.execute("RESET enable_seqscan")
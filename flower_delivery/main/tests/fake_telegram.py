@@ -0,0 +1,94 @@
+#
+# Локальный поддельный сервер Telegram Bot API для тестов
+# -------------------------------------------------------
+#
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class FakeTelegramServer:
+    """
+    Принимает запросы вида /bot<token>/<method> и запоминает их.
+    Ответы можно задать заранее через responses: список пар (код, тело),
+    после их исчерпания сервер отвечает {"ok": true}.
+    """
+
+    def __init__(self, delay=0):
+        self.requests = []  # Список пар (метод API, данные запроса)
+        self.responses = []
+        self.updates = []  # Обновления, которые отдает getUpdates
+        self.delay = delay  # Искусственная задержка ответа на отправку сообщений, в секундах
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, payload):
+        """Возвращает ответ на запрос. Можно переопределить в тестах."""
+        if method == "getUpdates":
+            offset = int(payload.get("offset") or 0)
+            with self.lock:
+                return 200, {"ok": True, "result": [u for u in self.updates if u["update_id"] >= offset][:100]}
+
+        if self.delay:
+            time.sleep(self.delay)
+        with self.lock:
+            self.requests.append((method, payload))
+            if self.responses:
+                return self.responses.pop(0)
+            message_id = len(self.requests)
+        # Ответ в формате объекта Message, чтобы его мог разобрать telebot
+        return 200, {"ok": True, "result": {
+            "message_id": message_id,
+            "date": 0,
+            "chat": {"id": int(payload.get("chat_id", 0)), "type": "private"},
+            "text": payload.get("text", ""),
+        }}
+
+    def sent_messages(self):
+        return [payload for method, payload in self.requests if method == "sendMessage"]
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Поддерживаем keep-alive
+
+            def do_POST(self):
+                path = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode(errors="replace")
+                payload = dict(parse_qsl(path.query))  # telebot передает параметры в строке запроса
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    payload.update(json.loads(body or "{}"))
+                elif self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                    payload.update(parse_qsl(body))
+                status, response = fake.handle(path.path.rsplit("/", 1)[-1], payload)
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass  # Не засоряем вывод тестов
+
+        return Handler
@@ -0,0 +1,200 @@
+import pytest
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from main.bot_orders import get_orders_page
+from main.models import User, Order, Product, DailySales, NotificationOutbox
+from main.order_status import advance_orders
+from main.pagination import ApproximateCountPaginator
+
+
+# ---------------- Фикстуры ----------------
+
+@pytest.fixture
+def admin_client(client, db):
+    admin = User.objects.create_superuser(username="boss", password="secret")
+    client.force_login(admin)
+    return client
+
+def make_orders(count, status="accepted"):
+    """Заказы покупателя с привязанным Telegram, по одному букету"""
+    user, _ = User.objects.get_or_create(username="customer", defaults={"telegram_chat_id": "777"})
+    product, _ = Product.objects.get_or_create(name="Букет Роз", defaults={"price": 1500})
+    orders = []
+    for _ in range(count):
+        order = Order.objects.create(user=user, total_price=1500, status=status, telegram_chat_id="777")
+        order.products.set([product])
+        orders.append(order)
+    return orders
+
+def sales_snapshot():
+    return {(row.day, row.status, row.product_id): (row.order_count, row.revenue) for row in DailySales.objects.all() if row.order_count}
+
+
+# ---------------- Массовая смена статусов ----------------
+
+@pytest.mark.django_db
+def test_advance_status_action_fixed_queries(admin_client):
+    """Действие "в следующий статус": число запросов не зависит от числа заказов"""
+    url = reverse("admin:main_order_changelist")
+    counts = []
+    for size in (1, 3, 30):  # Первый проход прогревает кэши Django (ContentType и т.п.)
+        Order.objects.all().delete()
+        NotificationOutbox.objects.all().delete()
+        orders = make_orders(size)
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(url, {"action": "advance_status", "_selected_action": [order.pk for order in orders]})
+        assert response.status_code == 302
+        counts.append(len(queries))
+
+        assert set(Order.objects.values_list("status", flat=True)) == {"assembling"}
+        assert NotificationOutbox.objects.filter(chat_id="777").count() == size
+        assert "В сборке" in NotificationOutbox.objects.first().text
+    assert counts[1] == counts[2]
+
+@pytest.mark.django_db
+def test_advance_status_invalidates_bot_orders_after_commit(admin_client, django_capture_on_commit_callbacks):
+    """Кэш "Мои заказы" в боте сбрасывается только после коммита - до него бот видит прежнюю страницу"""
+    orders = make_orders(2)
+    user_id = orders[0].user_id
+    get_orders_page(user_id)  # Страница в кэше
+
+    with django_capture_on_commit_callbacks(execute=True):
+        advance_orders(Order.objects.filter(pk__in=[order.pk for order in orders]))
+        assert "В сборке" not in get_orders_page(user_id)[0]
+    assert get_orders_page(user_id)[0].count("В сборке") == 2
+
+@pytest.mark.django_db
+def test_advance_status_keeps_sales_and_skips_delivered(admin_client):
+    """Сводка продаж совпадает с пересчитанной, доставленные заказы не меняются"""
+    on_the_way = make_orders(2, status="on_the_way")
+    delivered = make_orders(1, status="delivered")
+    NotificationOutbox.objects.all().delete()  # Уведомления о создании заказов не нужны
+
+    admin_client.post(reverse("admin:main_order_changelist"), {
+        "action": "advance_status", "_selected_action": [order.pk for order in on_the_way + delivered],
+    })
+
+    assert Order.objects.filter(status="delivered").count() == 3
+    assert NotificationOutbox.objects.count() == 2  # Уже доставленному повторно не пишем
+    assert all(message.reply_markup for message in NotificationOutbox.objects.all())  # Кнопка "Оставить отзыв"
+
+    incremental = sales_snapshot()
+    call_command("rebuild_daily_sales")
+    assert sales_snapshot() == incremental
+
+@pytest.mark.django_db
+def test_changelist_status_edits_saved_in_one_update(admin_client):
+    """Статусы, измененные в списке заказов, записываются пачкой с теми же уведомлениями"""
+    orders = make_orders(20)
+    url = reverse("admin:main_order_changelist")
+    formset = admin_client.get(url).context["cl"].formset
+
+    data = {
+        "form-TOTAL_FORMS": len(formset.forms), "form-INITIAL_FORMS": len(formset.forms),
+        "form-MIN_NUM_FORMS": 0, "form-MAX_NUM_FORMS": 1000, "_save": "Сохранить",
+    }
+    for i, form in enumerate(formset.forms):
+        data[f"form-{i}-id"] = form.instance.pk
+        data[f"form-{i}-status"] = "on_the_way"
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.post(url, data)
+
+    assert response.status_code == 302
+    assert sum(query["sql"].startswith('UPDATE "main_order"') for query in queries) == 1
+    assert sum(query["sql"].startswith('INSERT INTO "main_notificationoutbox"') for query in queries) == 1
+    assert Order.objects.filter(status="on_the_way").count() == len(orders)
+    assert NotificationOutbox.objects.filter(text__contains="В пути").count() == len(orders)
+    incremental = sales_snapshot()
+    call_command("rebuild_daily_sales")
+    assert sales_snapshot() == incremental
+
+@pytest.mark.django_db
+def test_changelist_status_edits_rolled_back_with_log(admin_client, monkeypatch):
+    """Запись статусов не удалась - журнал админки не говорит, что они изменены"""
+    orders = make_orders(2)
+    url = reverse("admin:main_order_changelist")
+
+    def fail(new_statuses):
+        raise IntegrityError("unique_daily_sales")
+
+    monkeypatch.setattr("main.admin.change_statuses", fail)
+    data = {
+        "form-TOTAL_FORMS": 2, "form-INITIAL_FORMS": 2, "form-MIN_NUM_FORMS": 0, "form-MAX_NUM_FORMS": 1000,
+        "_save": "Сохранить",
+    }
+    for i, order in enumerate(sorted(orders, key=lambda order: order.pk, reverse=True)):
+        data[f"form-{i}-id"] = order.pk
+        data[f"form-{i}-status"] = "on_the_way"
+    with pytest.raises(IntegrityError):
+        admin_client.post(url, data)
+
+    assert not LogEntry.objects.exists()
+    assert set(Order.objects.values_list("status", flat=True)) == {"accepted"}
+    assert not list(admin_client.get(url).context["messages"])
+
+
+# ---------------- Список заказов и страница пользователя ----------------
+
+@pytest.mark.django_db
+def test_order_changelist_fixed_queries(admin_client):
+    """Пользователи строк - через JOIN: число запросов не зависит от количества заказов"""
+    url = reverse("admin:main_order_changelist")
+    counts = []
+    for size in (1, 5, 40):  # Первый проход прогревает кэши Django
+        make_orders(size)
+        with CaptureQueriesContext(connection) as queries:
+            assert admin_client.get(url).status_code == 200
+        counts.append(len(queries))
+    assert counts[1] == counts[2]
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "sqlite", reason="Оценка PostgreSQL (reltuples) появляется только после ANALYZE")
+def test_approximate_count_paginator(monkeypatch):
+    """Без фильтров - оценка вместо COUNT(*), с фильтром - точный COUNT"""
+    monkeypatch.setattr(ApproximateCountPaginator, "EXACT_LIMIT", 10)
+    orders = make_orders(15)
+    Order.objects.filter(pk=orders[3].pk).delete()
+
+    with CaptureQueriesContext(connection) as queries:
+        count = ApproximateCountPaginator(Order.objects.order_by("-id"), 5).count
+    assert count == orders[-1].pk  # MAX(id): удаленный заказ еще учитывается - это оценка
+    assert not any("COUNT" in query["sql"] for query in queries)
+
+    assert ApproximateCountPaginator(Order.objects.filter(status="accepted").order_by("-id"), 5).count == 14
+    assert ApproximateCountPaginator(Order.objects.filter(status="delivered").order_by("-id"), 5).count == 0
+
+    paginator = ApproximateCountPaginator(Order.objects.order_by("-id"), 5)
+    paginator.__dict__["count"], paginator.is_estimate = 6, True  # Оценка меньше настоящего числа (как reltuples)
+    assert len(paginator.page(3)) == 4  # Страница за оценкой доступна
+
+@pytest.mark.django_db
+def test_filtered_changelist_pages_past_limit(admin_client, monkeypatch):
+    """Отфильтрованный список заказов листается до конца, даже если записей больше EXACT_LIMIT"""
+    monkeypatch.setattr(ApproximateCountPaginator, "EXACT_LIMIT", 10)
+    monkeypatch.setattr(admin.site._registry[Order], "list_per_page", 5)
+    orders = make_orders(30)
+    url = reverse("admin:main_order_changelist")
+
+    response = admin_client.get(url, {"status__exact": "accepted", "p": 6})
+    assert response.status_code == 200
+    assert [order.pk for order in response.context["cl"].result_list] == [order.pk for order in orders[4::-1]]
+
+@pytest.mark.django_db
+def test_user_page_shows_only_recent_orders(admin_client, django_assert_num_queries):
+    """Страница пользователя показывает последние заказы только для чтения; число запросов не зависит от заказов"""
+    orders = make_orders(25)
+    user = orders[0].user
+    url = reverse("admin:auth_user_change", args=[user.pk])
+    admin_client.get(url)  # Прогрев кэшей Django (ContentType и т.п.)
+
+    # Сессия, пользователи, группы и права - и один запрос последних заказов (без запроса на каждую строку)
+    with django_assert_num_queries(10):
+        response = admin_client.get(url)
+
+    formset = response.context["inline_admin_formsets"][0].formset
+    assert [form.instance.pk for form in formset.forms] == [order.pk for order in reversed(orders)][:20]
+    assert "Последние заказы" in response.content.decode()
@@ -0,0 +1,211 @@
+import pytest
+from types import SimpleNamespace
+import telegram_bot
+from django.core.cache import caches
+from django.test import override_settings
+from main import bot_orders
+from main.models import User, Order, NotificationOutbox, Product, Review
+from main.bot_users import ChatUser, ChatUserCache, ChatUsers, parse_admin_ids
+
+
+# ---------------- Фикстуры ----------------
+
+@pytest.fixture
+def bot_replies(monkeypatch):
+    """Перехватывает ответы бота вместо отправки в Telegram"""
+    replies = []
+    monkeypatch.setattr(telegram_bot.bot, "reply_to", lambda message, text, **kwargs: replies.append(text))
+    monkeypatch.setattr(telegram_bot.bot, "send_message", lambda chat_id, text, **kwargs: replies.append(text))
+    return replies
+
+def make_message(text, chat_id=555, username="tguser"):
+    """Имитирует входящее сообщение Telegram"""
+    return SimpleNamespace(
+        text=text,
+        chat=SimpleNamespace(id=chat_id),
+        from_user=SimpleNamespace(username=username),
+    )
+
+
+# ---------------- Тесты привязки Telegram ----------------
+
+@pytest.mark.django_db
+def test_start_links_all_orders_in_constant_queries(bot_replies, django_assert_num_queries):
+    """/start привязывает пользователя и все его заказы двумя запросами"""
+    user = User.objects.create(username="tguser")
+    Order.objects.bulk_create(Order(user=user, total_price=1000) for _ in range(50))
+
+    with django_assert_num_queries(2):
+        telegram_bot.start(make_message(f"/start {user.id}"))
+
+    user.refresh_from_db()
+    assert user.telegram_chat_id == "555"
+    assert Order.objects.filter(user=user, telegram_chat_id="555").count() == 50
+    assert not NotificationOutbox.objects.exists()  # Привязка не рассылает уведомлений
+    assert "успешно привязан" in bot_replies[0]
+
+
+@pytest.mark.django_db
+def test_start_with_unknown_user(bot_replies):
+    """/start с несуществующим пользователем сообщает об ошибке"""
+    telegram_bot.start(make_message("/start 999"))
+    telegram_bot.start(make_message("/start abc"))
+    assert bot_replies.count("Ошибка: пользователь не найден.") == 2
+
+
+@pytest.mark.django_db
+def test_connect_links_last_order(bot_replies):
+    """/connect привязывает только последний заказ пользователя"""
+    user = User.objects.create(username="tguser")
+    first = Order.objects.create(user=user, total_price=1000)
+    last = Order.objects.create(user=user, total_price=2000)
+
+    telegram_bot.connect_user(make_message("/connect"))
+
+    assert Order.objects.get(pk=last.pk).telegram_chat_id == "555"
+    assert Order.objects.get(pk=first.pk).telegram_chat_id is None
+
+
+# ---------------- Тесты "Мои заказы" ----------------
+
+@pytest.fixture
+def bot_markups(monkeypatch):
+    """Перехватывает сообщения бота вместе с кнопками и правки сообщений при листании"""
+    sent = []
+    monkeypatch.setattr(telegram_bot.bot, "send_message", lambda chat_id, text, **kwargs: sent.append((text, kwargs.get("reply_markup"))))
+    monkeypatch.setattr(telegram_bot.bot, "edit_message_text", lambda text, chat_id, message_id, **kwargs: sent.append((text, kwargs.get("reply_markup"))))
+    monkeypatch.setattr(telegram_bot.bot, "answer_callback_query", lambda *args, **kwargs: None)
+    return sent
+
+def make_callback(data, chat_id=555):
+    """Имитирует нажатие inline-кнопки"""
+    return SimpleNamespace(id="1", data=data, message=SimpleNamespace(chat=SimpleNamespace(id=chat_id), message_id=10))
+
+@pytest.fixture
+def customer_orders(db):
+    """Пользователь с 12 заказами; у последнего нет букета, один доставленный уже с отзывом"""
+    user = User.objects.create(username="tguser", telegram_chat_id="555")
+    product = Product.objects.create(name="Букет Роз", price=1500)
+    orders = Order.objects.bulk_create(Order(user=user, total_price=1500, status="delivered") for _ in range(12))
+    Order.products.through.objects.bulk_create(
+        Order.products.through(order_id=order.id, product_id=product.id) for order in orders[:-1]
+    )
+    Review.objects.create(user=user, product=product, order=orders[-2], rating=5, text="Отлично")
+    return user, orders
+
+@pytest.mark.django_db
+def test_my_orders_fixed_queries_and_paging(bot_markups, customer_orders, django_assert_num_queries):
+    """Страница - фиксированное число запросов; заказ без букета не ломает список; кнопки листают дальше"""
+    user, orders = customer_orders
+
+    with django_assert_num_queries(3):  # Пользователь, заказы с флагом отзыва, букеты
+        telegram_bot.my_orders(make_message("📦 Мои заказы"))
+    text, markup = bot_markups[-1]
+    assert f"Заказ №{orders[-1].id}" in text and f"Заказ №{orders[-6].id}" not in text
+    assert "Букет: Не указан" in text
+    assert text.count("Оставить отзыв") == 4  # У одного из пяти доставленных отзыв уже есть
+    assert text.count("Повторить заказ") == 4  # У заказа без букета повторять нечего
+
+    seen = []
+    while markup:
+        next_button = [button for button in markup.keyboard[0] if button.text.startswith("Более ранние")]
+        if not next_button:
+            break
+        assert len(next_button[0].callback_data.encode()) <= 64  # Ограничение Telegram
+        telegram_bot.my_orders_page(make_callback(next_button[0].callback_data))
+        text, markup = bot_markups[-1]
+        seen.append(text)
+    assert len(seen) == 2
+    assert f"Заказ №{orders[0].id}" in seen[-1]
+
+@pytest.mark.django_db
+def test_my_orders_cached_until_orders_change(bot_markups, customer_orders, django_assert_num_queries,
+                                              django_capture_on_commit_callbacks):
+    """Повторный запрос берет текст из кэша; смена статуса или новый отзыв сбрасывают кэш после коммита"""
+    user, orders = customer_orders
+    telegram_bot.my_orders(make_message("📦 Мои заказы"))
+
+    with django_assert_num_queries(0):  # Пользователь - из кэша процесса, страница - из кэша Django
+        telegram_bot.my_orders(make_message("📦 Мои заказы"))
+
+    order = Order.objects.get(pk=orders[-3].pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        order.status = "on_the_way"
+        order.save()
+        telegram_bot.my_orders(make_message("📦 Мои заказы"))
+        assert bot_markups[-1][0].count("В пути") == 0  # До коммита - прежняя страница из кэша
+    telegram_bot.my_orders(make_message("📦 Мои заказы"))
+    assert bot_markups[-1][0].count("В пути") == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Review.objects.create(user=user, product_id=order.products.first().id, order=orders[-4], rating=4, text="Хорошо")
+    telegram_bot.my_orders(make_message("📦 Мои заказы"))
+    assert bot_markups[-1][0].count("Оставить отзыв") == 2
+
+
+@pytest.mark.django_db
+def test_my_orders_sees_changes_from_site_process(bot_markups, customer_orders, tmp_path, monkeypatch):
+    """Статус меняет процесс сайта со своим экземпляром кэша - бот видит новую версию через общий файловый кэш"""
+    file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)}}
+    with override_settings(CACHES=file_cache):
+        user, orders = customer_orders
+        telegram_bot.my_orders(make_message("📦 Мои заказы"))
+
+        with monkeypatch.context() as site:
+            site.setattr(bot_orders, "cache", caches.create_connection('default'))  # Отдельное подключение, как в другом процессе
+            Order.objects.filter(pk=orders[-3].pk).update(status="on_the_way")
+            bot_orders.invalidate_bot_orders(user.id)
+
+        telegram_bot.my_orders(make_message("📦 Мои заказы"))
+        assert bot_markups[-1][0].count("В пути") == 1
+
+# ---------------- Тесты кэша пользователей бота ----------------
+
+def test_chat_user_cache_lru_and_ttl():
+    """Старые записи вытесняются, просроченные не возвращаются"""
+    now = [0]
+    cache = ChatUserCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("1", ChatUser(1))
+    cache.set("2", ChatUser(2))
+    cache.get("1")  # "1" использовали недавно - вытеснится "2"
+    cache.set("3", ChatUser(3))
+    assert cache.get("2") is None and cache.get("1").user_id == 1
+
+    now[0] = 10
+    assert cache.get("1") is None and len(cache) == 1
+
+def test_admin_ids_exact_match():
+    """Администраторы - точное совпадение со списком, а не подстрока"""
+    chat_users = ChatUsers(parse_admin_ids("123, 456"))
+    assert chat_users.is_admin(123) and chat_users.is_admin("456")
+    assert not chat_users.is_admin(12) and not chat_users.is_admin(1234)
+
+@pytest.mark.django_db
+def test_chat_users_cached_until_start_relinks(bot_replies, django_assert_num_queries):
+    """Серия сообщений - один запрос за пользователем; /start сбрасывает запись чата"""
+    with django_assert_num_queries(1):
+        for _ in range(20):
+            telegram_bot.my_orders(make_message("📦 Мои заказы"))
+    assert "не зарегистрированы" in bot_replies[-1]
+
+    user = User.objects.create(username="tguser")
+    telegram_bot.start(make_message(f"/start {user.id}"))
+    assert telegram_bot.chat_users.get(555).user_id == user.id
+
+
+# ---------------- Тесты отчетов для админа ----------------
+
+@pytest.mark.django_db
+def test_text_report_sent_from_memory(monkeypatch, tmp_path):
+    """Отчет уходит из памяти: файлов в рабочей папке нет, параллельные запросы не мешают друг другу"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(telegram_bot.chat_users, "admin_ids", frozenset({"555"}))
+    documents = []
+    monkeypatch.setattr(telegram_bot.bot, "send_document", lambda chat_id, document, **kwargs: documents.append(document))
+
+    telegram_bot.send_text_report(make_message("📊 Текстовый отчет за сегодня"))
+    telegram_bot.send_text_report(make_message("📊 Текстовый отчет за сегодня"))
+
+    assert [document.name for document in documents] == ["report_today.txt"] * 2
+    assert "Отчет" in documents[0].getvalue().decode("utf-8")
+    assert list(tmp_path.iterdir()) == []
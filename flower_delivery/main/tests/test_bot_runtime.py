@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+import telegram_bot
+from main.bot_runtime import AsyncBotRuntime
+
+
+def make_update(update_id, chat_id, text):
+    """Обновление Telegram с текстовым сообщением"""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+            "text": text,
+        },
+    }
+
+
+class RecordingBot:
+    """Имитирует TeleBot: запоминает порядок обработки и число одновременных обработчиков"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.handled = []
+
+    def process_new_updates(self, updates):
+        for update in updates:
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(self.delay)
+            with self.lock:
+                self.active -= 1
+                self.handled.append((update.message.chat.id, update.message.text))
+
+
+def test_runtime_is_concurrent_across_chats_and_ordered_within_chat(fake_telegram):
+    """Разные чаты обрабатываются параллельно (в пределах лимита), сообщения одного чата - по порядку"""
+    fake_telegram.updates = [
+        make_update(number * 10 + chat_id, chat_id, str(number))
+        for number in range(4)
+        for chat_id in range(1, 6)
+    ]
+    bot = RecordingBot(delay=0.05)
+    runtime = AsyncBotRuntime(bot, concurrency=3, poll_timeout=0)
+
+    asyncio.run(runtime.run(stop_when_idle=True))
+
+    assert runtime.processed == 20
+    for chat_id in range(1, 6):
+        assert [text for chat, text in bot.handled if chat == chat_id] == ["0", "1", "2", "3"]
+    assert 1 < bot.max_active <= 3
+
+
+def test_runtime_runs_bot_handlers(fake_telegram):
+    """Через асинхронный цикл работают настоящие обработчики бота"""
+    fake_telegram.updates = [make_update(1, 42, "🌐 Перейти на сайт")]
+
+    asyncio.run(AsyncBotRuntime(telegram_bot.bot, poll_timeout=0).run(stop_when_idle=True))
+
+    messages = fake_telegram.sent_messages()
+    assert len(messages) == 1
+    assert messages[0]["chat_id"] == "42"
+    assert "ссылка на наш сайт" in messages[0]["text"]
@@ -0,0 +1,32 @@
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "sqlite", reason="Настройки профиля SQLite"),
+]
+
+
+# Профиль SQLite: каждое новое соединение включает WAL, ослабленный synchronous и ожидание блокировки
+def test_sqlite_connection_pragmas(tmp_path):
+    settings_dict = {**settings.DATABASES["default"], "NAME": str(tmp_path / "db.sqlite3")}
+    wrapper = DatabaseWrapper(settings_dict)
+    try:
+        with wrapper.cursor() as cursor:
+            values = {}
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "temp_store"):
+                cursor.execute(f"PRAGMA {pragma}")
+                values[pragma] = cursor.fetchone()[0]
+    finally:
+        wrapper.close()
+
+    assert values == {
+        "journal_mode": "wal",
+        "synchronous": 1,  # NORMAL
+        "busy_timeout": settings.DATABASES["default"]["OPTIONS"]["timeout"] * 1000,
+        "temp_store": 2,  # MEMORY
+    }
+    assert wrapper.transaction_mode == "IMMEDIATE"
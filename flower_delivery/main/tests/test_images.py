@@ -0,0 +1,95 @@
+import pytest
+from io import BytesIO
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from main.images import render_renditions, save_renditions
+from main.models import Product
+
+
+# ---------------- Фикстуры ----------------
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """Файлы пишем во временную папку, а не в media/"""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+def make_image(size, mode="RGB", image_format="PNG"):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 50, 50, 128) if mode == "RGBA" else (200, 50, 50)).save(buffer, format=image_format)
+    return SimpleUploadedFile(f"bouquet.{image_format.lower()}", buffer.getvalue())
+
+@pytest.fixture
+def product(db):
+    return Product.objects.create(name="Букет Роз", price=2500, image=make_image((1500, 1000), mode="RGBA"))
+
+
+# ---------------- Тесты ----------------
+
+@pytest.mark.django_db
+def test_render_renditions_widths_and_formats(product):
+    """Копии всех ширин в WebP и JPEG, с хэшем содержимого в имени"""
+    renditions = render_renditions(product.image.name)
+
+    assert sorted(renditions["webp"], key=int) == ["320", "640", "960", "1280"]
+    assert sorted(renditions["jpeg"], key=int) == ["320", "640", "960", "1280"]
+    name = renditions["webp"]["640"]
+    assert name.startswith("products/") and f".{renditions['hash']}.640w.webp" in name
+    with default_storage.open(renditions["jpeg"]["320"]) as file:
+        with Image.open(file) as image:
+            assert (image.format, image.size) == ("JPEG", (320, 213))
+
+    # Повторный запуск не создает новых файлов - имена те же
+    assert render_renditions(product.image.name) == renditions
+
+
+@pytest.mark.django_db
+def test_small_image_not_upscaled(db):
+    """Изображение меньше минимальной ширины не увеличивается"""
+    small = Product.objects.create(name="Маленький", price=100, image=make_image((200, 100), image_format="JPEG"))
+    renditions = render_renditions(small.image.name)
+    assert list(renditions["webp"]) == ["200"]
+
+
+@pytest.mark.django_db
+def test_srcset_in_templates(client, product):
+    """Когда копии готовы, каталог и страница букета выдают srcset"""
+    assert save_renditions(product.id, render_renditions(product.image.name))
+    product.refresh_from_db()
+    assert "640w" in product.webp_srcset and "640w" in product.jpeg_srcset
+
+    for url in (reverse('catalog'), reverse('product_detail', args=[product.id])):
+        html = client.get(url).content.decode()
+        assert 'type="image/webp"' in html
+        assert product.jpeg_srcset in html
+
+
+@pytest.mark.django_db
+def test_renditions_scheduled_after_commit(monkeypatch, product, django_capture_on_commit_callbacks):
+    """Обработка изображения ставится в фон только после коммита и только при смене изображения"""
+    scheduled = []
+    monkeypatch.setattr("main.signals.schedule_renditions", scheduled.append)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        product.image = make_image((800, 600))
+        product.save()
+    assert scheduled == [product.id]
+
+    save_renditions(product.id, render_renditions(product.image.name))
+    product.refresh_from_db()
+    with django_capture_on_commit_callbacks(execute=True):
+        product.price = 3000
+        product.save()  # Изображение не менялось - копии актуальны
+    assert scheduled == [product.id]
+
+
+@pytest.mark.django_db
+def test_build_renditions_command(product):
+    """Команда создает копии для букетов, у которых их нет"""
+    call_command("build_renditions", workers=2)
+    product.refresh_from_db()
+    assert product.renditions["source"] == product.image.name
+    assert default_storage.exists(product.renditions["webp"]["1280"])
@@ -1,4 +1,6 @@
 import pytest
+from django.db import IntegrityError, transaction
+from main.cart import add_cart_line
 from main.models import User, Order, Product, Review, Cart
 
 
@@ -176,3 +178,20 @@ def test_cart_model():
 
     # Проверяем строковое представление объекта
     assert str(cart_item) == f"{product.name} для {user.username}"
+
+
+# Уникальность строки корзины: длинные адрес и открытка сравниваются по хешу,
+# поэтому открытка любой длины добавляется, а одинаковые строки по-прежнему объединяются
+@pytest.mark.django_db
+def test_cart_line_with_long_card_text():
+    user = User.objects.create(username="testuser")
+    product = Product.objects.create(name="Тестовый продукт", price=100)
+    card_text = "Поздравляю! " * 1000  # Длиннее предела строки B-tree индекса PostgreSQL
+
+    add_cart_line(user, product.id, card_text=card_text)
+    add_cart_line(user, product.id, card_text=card_text)
+    add_cart_line(user, product.id, card_text=card_text + "!")
+
+    assert sorted(Cart.objects.values_list("quantity", flat=True)) == [1, 2]
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Cart.objects.create(user=user, product=product, card_text=card_text)
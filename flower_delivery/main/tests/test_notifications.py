@@ -0,0 +1,142 @@
+import pytest
+import main.notifications
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from main.models import User, Product, Cart, Order, NotificationOutbox
+from main.notifications import CLAIM_TIMEOUT, claim_batch, dispatch_batch, enqueue_telegram_message
+
+
+# ---------------- Фикстуры ----------------
+
+@pytest.fixture
+def telegram_user(db):
+    """Пользователь с подключенным Telegram"""
+    user = User.objects.create_user(username="tguser", password="password123")
+    user.telegram_chat_id = "555"
+    user.save()
+    return user
+
+
+# ---------------- Тесты очереди уведомлений ----------------
+
+@pytest.mark.django_db
+def test_finalize_order_only_enqueues(client, telegram_user, fake_telegram):
+    """Оформление заказа записывает уведомление в очередь, не обращаясь к Telegram"""
+    product = Product.objects.create(name="Букет Роз", price=1500)
+    Cart.objects.create(user=telegram_user, product=product, address="ул. Ленина, 1")
+    client.force_login(telegram_user)
+
+    response = client.post(reverse("finalize_order"))
+
+    assert response.status_code == 302
+    assert Order.objects.filter(user=telegram_user).count() == 1
+    assert NotificationOutbox.objects.filter(chat_id="555", status="pending").count() == 1
+    assert fake_telegram.requests == []
+
+
+@pytest.mark.django_db
+def test_status_change_is_delivered_by_dispatcher(telegram_user, fake_telegram):
+    """Смена статуса попадает в очередь и доставляется командой dispatch_notifications"""
+    order = Order.objects.create(user=telegram_user, total_price=1500, telegram_chat_id="555")
+    order.status = "assembling"
+    order.save()
+
+    call_command("dispatch_notifications", "--once")
+
+    messages = fake_telegram.sent_messages()
+    assert len(messages) == 1
+    assert messages[0]["chat_id"] == "555"
+    assert "В сборке" in messages[0]["text"]
+    assert NotificationOutbox.objects.get().status == "sent"
+
+
+@pytest.mark.django_db
+def test_dispatch_retries_with_backoff(fake_telegram):
+    """Временная ошибка Telegram откладывает отправку, следующая попытка успешна"""
+    message = enqueue_telegram_message("555", "Тест")
+    fake_telegram.responses = [(502, {"ok": False})]
+
+    assert dispatch_batch() == 1
+    message.refresh_from_db()
+    assert message.status == "pending"
+    assert message.attempts == 1
+    assert message.next_attempt_at > timezone.now()
+
+    assert dispatch_batch() == 0  # Время следующей попытки еще не пришло
+
+    NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+    assert dispatch_batch() == 1
+    message.refresh_from_db()
+    assert message.status == "sent"
+    assert message.attempts == 2
+    assert len(fake_telegram.sent_messages()) == 2
+
+
+@pytest.mark.django_db
+def test_dispatch_gives_up_on_permanent_error(fake_telegram):
+    """Если чат не найден, сообщение помечается как ошибочное без повторов"""
+    message = enqueue_telegram_message("555", "Тест")
+    fake_telegram.responses = [(400, {"ok": False, "description": "chat not found"})]
+
+    dispatch_batch()
+
+    message.refresh_from_db()
+    assert message.status == "failed"
+    assert "chat not found" in message.last_error
+
+
+@pytest.mark.django_db
+def test_claimed_messages_skipped_by_other_dispatcher(fake_telegram):
+    """Сообщения, забранные одним диспетчером, другой не отправляет; незавершенные возвращаются после CLAIM_TIMEOUT"""
+    enqueue_telegram_message("555", "Тест")
+    assert len(claim_batch()) == 1  # Первый диспетчер забрал сообщение и упал, не отправив его
+
+    assert dispatch_batch() == 0
+    assert fake_telegram.sent_messages() == []
+
+    NotificationOutbox.objects.update(next_attempt_at=timezone.now() - CLAIM_TIMEOUT)
+    assert dispatch_batch() == 1
+    assert NotificationOutbox.objects.get().status == "sent"
+
+
+@pytest.mark.django_db
+def test_dispatch_saves_each_result_immediately(fake_telegram, monkeypatch):
+    """Сбой посреди пачки: уже отправленное сообщение записано как отправленное и не уйдет повторно"""
+    first = enqueue_telegram_message("555", "Первое")
+    second = enqueue_telegram_message("555", "Второе")
+    send = main.notifications.send_outbox_message
+
+    def crash_on_second(message, client):
+        if message.pk == second.pk:
+            raise RuntimeError("процесс упал")
+        send(message, client)
+
+    monkeypatch.setattr(main.notifications, "send_outbox_message", crash_on_second)
+    with pytest.raises(RuntimeError):
+        dispatch_batch()
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.status, second.status) == ("sent", "sending")
+    assert len(fake_telegram.sent_messages()) == 1
+
+
+@pytest.mark.django_db
+def test_only_real_status_transitions_are_notified(telegram_user):
+    """Повторное сохранение заказа без смены статуса не создает уведомлений"""
+    order = Order.objects.create(user=telegram_user, total_price=1500, telegram_chat_id="555")
+    order.status = "assembling"
+    order.save()
+    assert NotificationOutbox.objects.count() == 1
+
+    order.address = "Новый адрес"
+    order.save()
+    reloaded = Order.objects.get(pk=order.pk)
+    reloaded.telegram_chat_id = "777"
+    reloaded.save()
+    assert NotificationOutbox.objects.count() == 1
+
+    reloaded.status = "delivered"
+    reloaded.save()
+    assert list(NotificationOutbox.objects.values_list("chat_id", flat=True).order_by("id")) == ["555", "777"]
@@ -0,0 +1,107 @@
+import datetime
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from main.models import User, Order, Product, DailySales
+from main.sales import apply_sales_deltas, local_date_range, period_filter, report_periods
+
+
+def sales_snapshot():
+    """Сводка продаж в виде словаря без нулевых строк"""
+    return {
+        (row.day, row.status, row.product_id): (row.order_count, row.revenue)
+        for row in DailySales.objects.all()
+        if row.order_count
+    }
+
+
+# Тест инкрементального обновления сводки
+# Создаем заказы, привязываем букеты, меняем статусы и удаляем заказ
+# Сводка должна совпадать с пересчитанной с нуля командой rebuild_daily_sales
+@pytest.mark.django_db
+def test_daily_sales_follow_orders():
+    user = User.objects.create(username="testuser")
+    roses = Product.objects.create(name="Букет Роз", price=1500)
+    lilies = Product.objects.create(name="Букет Лилий", price=2000)
+
+    first = Order.objects.create(user=user, total_price=1500)
+    first.products.set([roses])
+    second = Order.objects.create(user=user, total_price=2000)
+    second.products.set([lilies])
+    third = Order.objects.create(user=user, total_price=2000)
+    third.products.set([lilies])
+
+    first.status = "assembling"
+    first.save()
+    second.status = "delivered"
+    second.save()
+    second.address = "Новый адрес"  # Изменение без смены статуса не трогает сводку
+    second.save()
+    third.delete()
+
+    today = timezone.localdate()
+    incremental = sales_snapshot()
+    assert incremental == {
+        (today, "assembling", roses.id): (1, 1500),
+        (today, "delivered", lilies.id): (1, 2000),
+    }
+
+    call_command("rebuild_daily_sales")
+    assert sales_snapshot() == incremental
+
+
+# Параллельная транзакция создала строку сводки между проверкой и вставкой:
+# вставка пропускает конфликт, изменение добавляется к уже созданной строке, а не падает на unique_daily_sales
+@pytest.mark.django_db
+def test_sales_deltas_survive_concurrent_insert(monkeypatch):
+    roses = Product.objects.create(name="Букет Роз", price=1500)
+    today = timezone.localdate()
+    bulk_create = DailySales.objects.bulk_create
+
+    def concurrent_bulk_create(objs, **kwargs):
+        DailySales.objects.create(day=today, status="accepted", product=roses, order_count=1, revenue=1500)
+        return bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(DailySales.objects, "bulk_create", concurrent_bulk_create)
+    apply_sales_deltas({(today, "accepted", roses.id): (1, 1500)})
+
+    assert sales_snapshot() == {(today, "accepted", roses.id): (2, 3000)}
+
+
+# Границы дня считаются в часовом поясе проекта (Europe/Moscow), интервал полуоткрытый:
+# заказ в 23:59 попадает в свой день, в 00:00 следующего дня - уже нет
+@pytest.mark.django_db
+def test_local_date_range_half_open():
+    user = User.objects.create(username="testuser")
+    day = datetime.date(2026, 3, 10)
+    start, end = local_date_range(day, day + datetime.timedelta(days=1))
+    assert start.utcoffset() == datetime.timedelta(hours=3)  # Москва, а не UTC сервера
+
+    for created_at in (start - datetime.timedelta(seconds=1), start, end - datetime.timedelta(microseconds=1), end):
+        Order.objects.filter(pk=Order.objects.create(user=user, total_price=100).pk).update(created_at=created_at)
+
+    assert Order.objects.filter(created_at__gte=start, created_at__lt=end).count() == 2
+    assert report_periods(day)["today"] == (day, day + datetime.timedelta(days=1))
+    assert local_date_range(day, None) == (start, None)  # Открытый интервал - для выгрузки без конечной даты
+
+
+# Частые запросы идут по индексам: план EXPLAIN называет индекс, а не полный просмотр таблицы
+# (уникальный индекс сводки SQLite называет autoindex - для него проверяем условие поиска по day)
+@pytest.mark.django_db
+def test_hot_queries_use_indexes(prefer_indexes):
+    full_scan = prefer_indexes
+    sales_index = "(day>? AND day<?)" if connection.vendor == "sqlite" else "unique_daily_sales"
+    user = User.objects.create(username="testuser", telegram_chat_id="42")
+    start, end = local_date_range(*report_periods()["week"])
+
+    plans = {
+        "order_user_created_idx": Order.objects.filter(user=user).order_by("-created_at", "-id")[:20],
+        "order_status_created_idx": Order.objects.filter(status="accepted").order_by("-created_at")[:100],
+        "order_created_idx": Order.objects.filter(created_at__gte=start, created_at__lt=end),
+        "telegram_chat_id": User.objects.filter(telegram_chat_id="42"),
+        sales_index: DailySales.objects.filter(period_filter(report_periods()["month"])),
+    }
+    for index, queryset in plans.items():
+        plan = queryset.explain()
+        assert index in plan and full_scan not in plan, plan
@@ -0,0 +1,78 @@
+import pytest
+from django.urls import reverse
+from main.models import Product
+from main.search import fts_query, rebuild_search_index, search_products
+from main.stemmer import stem
+
+
+# ---------------- Фикстуры ----------------
+
+@pytest.fixture
+def bouquets(db):
+    return {
+        "roses": Product.objects.create(name="Букет роз", description="Пятнадцать алых цветов", price=2500, image="products/roses.jpg"),
+        "tulips": Product.objects.create(name="Тюльпаны", description="Весенний букет с розами и тюльпанами", price=1500, image="products/tulips.jpg"),
+        "lilies": Product.objects.create(name="Белые лилии", description="Нежные цветы", price=3000, image="products/lilies.jpg"),
+    }
+
+
+# ---------------- Тесты ----------------
+
+@pytest.mark.parametrize("word, expected", [
+    ("розами", "роз"), ("розы", "роз"), ("роз", "роз"),
+    ("тюльпанов", "тюльпан"), ("белые", "бел"), ("лилии", "лил"),
+    ("ёлки", "елк"), ("красивейший", "красив"),
+])
+def test_stem(word, expected):
+    """Русский стеммер отрезает окончания"""
+    assert stem(word) == expected
+
+def test_fts_query_drops_syntax():
+    """Кавычки и операторы FTS5 из запроса не попадают в MATCH"""
+    assert fts_query('розы" OR name:*') == '"роз"* "or"* "name"*'
+    assert fts_query("!!!") == ""
+
+@pytest.mark.django_db
+def test_search_finds_word_forms_and_ranks_name_first(bouquets):
+    """'розами' находит 'Букет роз'; совпадение в названии выше, чем в описании"""
+    assert search_products("розами") == [bouquets["roses"], bouquets["tulips"]]
+    assert search_products("белая лилия") == [bouquets["lilies"]]
+    assert search_products("орхидеи") == []
+    assert search_products("   ") == []
+
+@pytest.mark.django_db
+def test_search_index_follows_changes(bouquets):
+    """Правка и удаление букета сразу видны в поиске"""
+    lilies = bouquets["lilies"]
+    lilies.name = "Пионы"
+    lilies.save()
+    assert search_products("лилии") == []
+    assert search_products("пион") == [lilies]
+
+    bouquets["roses"].delete()
+    assert search_products("розы") == [bouquets["tulips"]]
+
+@pytest.mark.django_db
+def test_search_on_large_catalog(django_assert_num_queries):
+    """На 2000 букетах поиск - два запроса (по индексу FTS5 и загрузка найденных букетов)"""
+    words = ["розы", "тюльпаны", "лилии", "пионы", "хризантемы", "гортензии", "ромашки", "орхидеи"]
+    Product.objects.bulk_create(
+        Product(name=f"Букет №{i}: {words[i % len(words)]}", description=f"Сборный букет, {words[(i * 3) % len(words)]} и зелень",
+                price=1000 + i, image="products/bulk.jpg")
+        for i in range(2000)
+    )
+    rebuild_search_index()  # bulk_create обходит сигналы
+
+    with django_assert_num_queries(2):
+        results = search_products("гортензиями")
+    assert len(results) == 50
+    assert all("гортензи" in product.name for product in results[:10])
+
+@pytest.mark.django_db
+def test_search_page(client, bouquets):
+    """Страница поиска показывает найденные букеты"""
+    response = client.get(reverse("search"), {"q": "тюльпаны"})
+
+    assert response.status_code == 200
+    assert list(response.context["products"]) == [bouquets["tulips"]]
+    assert "Тюльпаны" in response.content.decode()
@@ -0,0 +1,97 @@
+import pytest
+from django.utils import timezone
+import telegram_bot
+from main.notifications import enqueue_telegram_message, dispatch_batch
+from main.telegram_api import RateLimiter, TelegramClient
+
+
+class FakeClock:
+    """Часы, которые двигаются только при вызове sleep"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(global_rate=30, chat_rate=1, clock=clock, sleep=clock.sleep)
+
+def too_many_requests(retry_after):
+    return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                 "parameters": {"retry_after": retry_after}}
+
+
+# ---------------- Ограничитель частоты ----------------
+
+def test_limiter_one_message_per_second_per_chat(clock, limiter):
+    """Второе сообщение в тот же чат ждет секунду, в другой чат - не ждет"""
+    limiter.acquire(1)
+    limiter.acquire(2)
+    assert clock.sleeps == []
+
+    limiter.acquire(1)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+
+def test_limiter_global_rate(clock, limiter):
+    """Больше 30 сообщений в секунду в разные чаты не отправляется"""
+    for chat_id in range(30):
+        limiter.acquire(chat_id)
+    assert clock.sleeps == []
+
+    limiter.acquire(100)
+    assert clock.sleeps == [pytest.approx(1 / 30)]
+
+
+def test_limiter_pause_blocks_chat(clock, limiter):
+    """После 429 чат блокируется на retry_after секунд"""
+    limiter.pause(1, 5)
+    limiter.acquire(2)
+    limiter.acquire(1)
+    assert clock.sleeps == [pytest.approx(5)]
+
+
+# ---------------- Клиент ----------------
+
+def test_client_honors_retry_after(fake_telegram, clock, limiter):
+    """Клиент ждет retry_after и повторяет запрос"""
+    client = TelegramClient("123:abc", fake_telegram.url, limiter=limiter)
+    fake_telegram.responses = [too_many_requests(3)]
+
+    result = client.send_message(5, "Привет")
+
+    assert result["message_id"] == 2
+    assert len(fake_telegram.sent_messages()) == 2
+    assert clock.sleeps == [pytest.approx(3)]
+
+
+def test_telebot_uses_shared_client(fake_telegram):
+    """Сообщения telebot уходят через общий клиент на настроенный адрес API"""
+    telegram_bot.bot.send_message(5, "Привет из бота")
+
+    assert fake_telegram.sent_messages()[0]["text"] == "Привет из бота"
+
+
+@pytest.mark.django_db
+def test_dispatcher_postpones_long_retry_after(fake_telegram):
+    """Если Telegram просит ждать долго, диспетчер откладывает сообщение, а не блокируется"""
+    message = enqueue_telegram_message("555", "Тест")
+    fake_telegram.responses = [too_many_requests(120)]
+
+    dispatch_batch()
+
+    message.refresh_from_db()
+    assert message.status == "pending"
+    assert message.next_attempt_at >= timezone.now() + timezone.timedelta(seconds=110)
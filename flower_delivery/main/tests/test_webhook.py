@@ -0,0 +1,44 @@
+import json
+from django.urls import reverse
+from main.tests.test_bot_runtime import make_update
+
+
+SECRET = "webhook-secret"
+
+
+def post_update(client, data, secret=SECRET):
+    return client.post(
+        reverse("telegram_webhook"),
+        data=json.dumps(data),
+        content_type="application/json",
+        headers={"X-Telegram-Bot-Api-Secret-Token": secret},
+    )
+
+
+def test_webhook_runs_bot_handlers(client, settings, fake_telegram):
+    """Обновление из webhook попадает в те же обработчики, что и при polling"""
+    settings.TELEGRAM_WEBHOOK_SECRET = SECRET
+
+    response = post_update(client, make_update(1, 42, "🌐 Перейти на сайт"))
+
+    assert response.status_code == 200
+    messages = fake_telegram.sent_messages()
+    assert len(messages) == 1
+    assert messages[0]["chat_id"] == "42"
+
+
+def test_webhook_rejects_wrong_secret(client, settings, fake_telegram):
+    """Без правильного секретного токена обновления не обрабатываются"""
+    settings.TELEGRAM_WEBHOOK_SECRET = SECRET
+
+    assert post_update(client, make_update(1, 42, "🌐 Перейти на сайт"), secret="wrong").status_code == 403
+    assert post_update(client, make_update(1, 42, "🌐 Перейти на сайт"), secret="").status_code == 403
+    assert client.get(reverse("telegram_webhook")).status_code == 405
+    assert post_update(client, ["not", "an", "update"]).status_code == 400
+    assert fake_telegram.sent_messages() == []
+
+
+def test_webhook_disabled_without_secret(client, settings):
+    """Если секрет не задан, webhook выключен"""
+    settings.TELEGRAM_WEBHOOK_SECRET = ""
+    assert post_update(client, make_update(1, 42, "/start"), secret="").status_code == 404
@@ -6,6 +6,8 @@ from django.contrib.auth import views as auth_views
 urlpatterns = [
     path('', views.catalog, name='home'),  # Главная страница
     path('catalog/', views.catalog, name='catalog'),  # Каталог товаров
+    path('catalog/more/', views.catalog_more, name='catalog_more'),  # Подгрузка карточек при прокрутке
+    path('search/', views.product_search, name='search'),  # Поиск по каталогу
     path('product/<int:product_id>/', views.product_detail, name='product_detail'),  # Детали товара
     path('cart/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'), # Добавление товара в корзину
     path('cart/', views.cart, name='cart'), # Просмотр корзины
@@ -21,5 +23,6 @@ urlpatterns = [
     path("order/<int:order_id>/review/", views.leave_review, name="leave_review"), # Отзывы
     path("reports/", views.admin_reports, name="admin_reports"),  # Страница отчётов для администратора
     path("reports/download/", views.download_report, name="download_report"), # Скачивание отчета для администратора
+    path("reports/export/", views.export_orders, name="export_orders"), # Выгрузка заказов (CSV/XLSX)
     path("order/<int:order_id>/repeat/", views.repeat_order, name="repeat_order"), # Повторный заказ
 ]
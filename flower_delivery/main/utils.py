@@ -39,13 +39,27 @@ def generate_card_info(text, signature):
         ]
 
 
+def get_order_bouquet(order):
+    """
+    Возвращает первый букет заказа (или None).
+    Если букеты загружены через prefetch_related("products"), запросов к базе не будет.
+    """
+    return min(order.products.all(), key=lambda product: product.pk, default=None)
+
+
+def get_bouquet_name(order):
+    """Название первого букета заказа"""
+    bouquet = get_order_bouquet(order)
+    return bouquet.name if bouquet else "Не указан"
+
+
 def send_order_notification(order):
     """
     Формирует основную часть уведомления о заказе.
     :param order: Объект заказа
     :return: Текст сообщения
     """
-    message_text = f"🌸 *Букет:* {order.products.first().name if order.products.exists() else 'Не указан'}\n"
+    message_text = f"🌸 *Букет:* {get_bouquet_name(order)}\n"
     message_text += f"📍 *Адрес доставки:* {order.address if order.address else 'Не указан'}\n"
 
     # Формируем части открытки
@@ -59,6 +73,29 @@ def send_order_notification(order):
     return message_text
 
 
+def generate_checkout_messages(orders, limit=4000):
+    """
+    Формирует одно уведомление на всё оформление заказа.
+    Если текст не помещается в одно сообщение Telegram, он делится на части.
+    :param orders: заказы с предзагруженными букетами
+    :return: список текстов сообщений
+    """
+    header = "🛍 *Ваш заказ подтверждён!*\n\n"
+    footer = "🌸 Ожидайте дальнейшей информации о статусе заказа!"
+
+    messages = [header]
+    for order in orders:
+        block = f"🔹 *Заказ №{order.id}*\n" + send_order_notification(order) + "------------------------\n"
+        if len(messages[-1]) + len(block) > limit:
+            messages.append("")
+        messages[-1] += block
+
+    if len(messages[-1]) + len(footer) > limit:
+        messages.append("")
+    messages[-1] += footer
+    return messages
+
+
 
 def generate_order_message(order):
     """Генерирует текстовое сообщение о заказе"""
@@ -67,21 +104,25 @@ def generate_order_message(order):
         f"📢 Обновление статуса заказа №{order.id}!\n\n"
         f"🔄 Новый статус: *{translated_status}*\n"
         f"📅 Дата заказа: {order.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-        f"💐 Букет: {order.products.first().name if order.products.exists() else 'Не указан'}\n"
+        f"💐 Букет: {get_bouquet_name(order)}\n"
         f"📍 Адрес доставки: {order.address}\n"
         f"💰 Цена: {order.total_price} руб."
     )
 
 
-def generate_review_button(order):
-    """Генерирует кнопку для оставления отзыва, если заказ доставлен"""
+def generate_review_button(order, review_exists=None):
+    """
+    Генерирует кнопку для оставления отзыва, если заказ доставлен.
+    :param review_exists: есть ли уже отзыв (если известно заранее - без запроса к базе)
+    """
     if order.status != "delivered":
         return None
 
-    review_exists = Review.objects.filter(order=order).exists()
+    if review_exists is None:
+        review_exists = Review.objects.filter(order=order).exists()
 
     if review_exists:
-        review_url = f"{settings.SITE_URL}/product/{order.products.first().id}/"
+        review_url = f"{settings.SITE_URL}/product/{get_order_bouquet(order).id}/"
         button_text = "🌟 Посмотреть отзывы"
     else:
         review_url = f"{settings.SITE_URL}/order/{order.id}/review/"
@@ -3,15 +3,36 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import login, logout, update_session_auth_hash
-from .forms import UserRegistrationForm, ReviewForm
-from .models import Product, Cart, Order, Review
+from .forms import UserRegistrationForm, ReviewForm, CatalogFilterForm, OrderExportForm
+from .models import Product, Cart, Order, Review, DailySales
 from django import template
-from telegram_bot import send_telegram_message
-from django.db import models
-from django.utils.timezone import now, timedelta
-from django.http import HttpResponse
+from django.db import models, transaction
+from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.timezone import localdate
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, Http404, StreamingHttpResponse,
+)
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
+import json
+from datetime import timedelta
+from collections import Counter
 from main.reports import generate_text_report
-from main.utils import STATUS_TRANSLATION, generate_card_info, send_order_notification
+from main.utils import STATUS_TRANSLATION, generate_card_info, generate_checkout_messages, get_bouquet_name
+from main.pagination import InvalidCursor, keyset_page
+from main.context_processors import invalidate_cart_item_count
+from main.bot_orders import invalidate_bot_orders
+from main.catalog_cache import cache_catalog_page
+from main.cart import add_cart_line, expand_cart_lines, remove_one, save_cart_details
+from main.notifications import enqueue_telegram_messages
+from main.sales import local_date_range, period_filter, record_orders, report_periods
+from main.exports import async_chunks, export_queryset, stream_csv, write_xlsx, xlsx_available
+from main.popularity import apply_sold_deltas
+from main.search import search_products
 
 
 # функции для извлечения текста открытки и подписи
@@ -34,9 +55,77 @@ def get_signature(card_info):
     return ""
 
 
-def catalog(request):
+CATALOG_PAGE_SIZE = 24  # Букетов на странице каталога (и в каждой подгрузке при прокрутке)
+
+# Сортировки каталога. Последнее поле - id, чтобы курсор однозначно указывал на букет;
+# для каждой сортировки есть индекс (см. Product.Meta.indexes)
+CATALOG_ORDERINGS = {
+    "": ("id",),
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "popular": ("-sold_count", "-id"),
+    # Рейтинг хранится в самом букете - сортировка без агрегатов по отзывам
+    "rating": ("-rating_avg", "-rating_count", "-id"),
+}
+
+
+def get_catalog_page(request):
+    """
+    Страница каталога по параметрам запроса: фильтр по цене, сортировка и курсор (after).
+    :return: (форма фильтра, страница KeysetPage, параметры ссылки на следующую страницу или None)
+    :raises InvalidCursor: если курсор поврежден
+    """
+    form = CatalogFilterForm(request.GET)
+    form.is_valid()  # Ошибочные параметры просто не применяются
+    filters = form.cleaned_data
+
     products = Product.objects.all()
-    return render(request, 'main/catalog.html', {'products': products})
+    if filters.get('min_price') is not None:
+        products = products.filter(price__gte=filters['min_price'])
+    if filters.get('max_price') is not None:
+        products = products.filter(price__lte=filters['max_price'])
+
+    ordering = CATALOG_ORDERINGS[filters.get('sort') or ""]
+    page = keyset_page(products, ordering, request.GET.get('after'), CATALOG_PAGE_SIZE)
+
+    next_query = None
+    if page.has_next:
+        params = request.GET.copy()
+        params['after'] = page.next_cursor
+        next_query = params.urlencode()
+    return form, page, next_query
+
+
+@cache_catalog_page
+def catalog(request):
+    try:
+        form, page, next_query = get_catalog_page(request)
+    except InvalidCursor:
+        return redirect('catalog')
+    return render(request, 'main/catalog.html', {
+        'products': page,
+        'filter_form': form,
+        'sort': form.cleaned_data.get('sort'),
+        'next_query': next_query,
+    })
+
+
+# Следующая порция карточек для бесконечной прокрутки (только HTML карточек, без шапки страницы)
+@cache_catalog_page
+def catalog_more(request):
+    try:
+        _, page, next_query = get_catalog_page(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Некорректный курсор")
+    return render(request, 'main/catalog_items.html', {'products': page, 'next_query': next_query})
+
+
+# Поиск по каталогу (название и описание, с учетом словоформ)
+@cache_catalog_page
+def product_search(request):
+    query = request.GET.get('q', '').strip()
+    products = search_products(query)
+    return render(request, 'main/catalog.html', {'products': products, 'query': query})
 
 
 # ---------------Пользователь-------------------------------
@@ -84,25 +173,30 @@ def profile(request):
 # ------------- Корзина -----------------
 
 # Один продукт = один букет
+REVIEWS_PER_PAGE = 10
+
+@cache_catalog_page
 def product_detail(request, product_id):
     product = get_object_or_404(Product, id=product_id)  # Получаем товар по ID или возвращаем 404
-    reviews = Review.objects.filter(product=product).order_by('-created_at')  # ✅ Берем все отзывы, а не только текущего пользователя
-    return render(request, 'main/product_detail.html', {"product": product, "reviews": reviews})
+    # Отзывы всех пользователей постранично, автор - через JOIN
+    reviews = Review.objects.filter(product=product).select_related('user').order_by('-created_at', '-id')
+    paginator = Paginator(reviews, REVIEWS_PER_PAGE)
+    paginator.count = product.rating_count  # Количество отзывов уже хранится в букете - без COUNT(*)
+    page = paginator.get_page(request.GET.get('page'))
+    return render(request, 'main/product_detail.html', {"product": product, "reviews": page})
 
 
 # Функция для добавления в корзину
 def add_to_cart(request, product_id):
-    product = Product.objects.get(id=product_id)
+    product = get_object_or_404(Product, id=product_id)
 
     # Если пользователь не авторизован, перенаправляем на страницу логина
     if not request.user.is_authenticated:
         return redirect('login')
 
-    # Создаём новую запись в корзине для каждого добавления
-    Cart.objects.create(
-        user=request.user,
-        product=product
-    )
+    # Одинаковые букеты копятся в одной строке корзины: увеличиваем количество одним UPDATE
+    add_cart_line(request.user, product.id)
+    invalidate_cart_item_count(request.user)
 
     # Перенаправляем обратно на ту же страницу, где был пользователь
     return redirect(request.META.get('HTTP_REFERER', 'catalog'))
@@ -113,47 +207,60 @@ def cart(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    cart_items = Cart.objects.filter(user=request.user)  # Получаем товары в корзине
+    cart_items = list(Cart.objects.filter(user=request.user).select_related('product').order_by('id'))  # Товары в корзине
     for item in cart_items:
-        item.total_price = item.product.price  # "Итого" для каждой позиции — это цена самого товара
-    total_price = sum(item.product.price for item in cart_items)  # Общая стоимость корзины
+        item.total_price = item.product.price * item.quantity  # "Итого" для позиции
+    total_price = sum(item.total_price for item in cart_items)  # Общая стоимость корзины
     return render(request, 'main/cart.html', {'cart_items': cart_items, 'total_price': total_price})
 
 
 # Удаление товара из корзины
 def delete_cart_item(request, cart_item_id):
     cart_item = get_object_or_404(Cart, id=cart_item_id, user=request.user)
-    cart_item.delete()
+    remove_one(cart_item)  # Убираем один букет из позиции
+    invalidate_cart_item_count(request.user)
     return redirect('cart')
 
 
 # -------------- Заказы ----------------------
 
 # Отображение списка заказов на странице "Мои заказы"
+ORDERS_PER_PAGE = 20
+
 def user_orders(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    orders = Order.objects.filter(user=request.user).select_related("review").order_by('-created_at')
+    # Букеты загружаем одним запросом на страницу, отзыв - через JOIN
+    orders = (
+        Order.objects.filter(user=request.user)
+        .select_related("review")
+        .prefetch_related(models.Prefetch("products", queryset=Product.objects.only("id", "name")))
+    )
+    try:
+        # Страницы по ключу (created_at, id): номер страницы не влияет на скорость
+        page = keyset_page(orders, ("-created_at", "-id"), request.GET.get("after"), ORDERS_PER_PAGE)
+    except InvalidCursor:
+        return redirect('user_orders')
 
     # Подготовка структуры для хранения отформатированных данных заказов
     formatted_orders = []
-    for order in orders:
+    for order in page:
         # Формируем корректное сообщение об открытке
         card_info = generate_card_info(order.card_text, order.signature)
 
         formatted_orders.append({
             "order_id": order.id,
             "status": STATUS_TRANSLATION.get(order.status, order.status),  # Переводим статус
-            "created_at": order.created_at.strftime("%d.%m.%Y %H:%M"),  # Форматируем дату
-            "bouquet_name": order.products.first().name if order.products.exists() else "Не указан",  # Название букета
+            "created_at": order.created_at,  # Форматируется в шаблоне (в часовом поясе сайта)
+            "bouquet_name": get_bouquet_name(order),  # Название букета (из prefetch, без запроса)
             "delivery_address": order.address if order.address else "Адрес не указан",
             "card_info": card_info,  # Открытка и подпись
             "price": order.total_price,  # Цена
             "has_review": hasattr(order, "review")  # Проверяем, есть ли у заказа отзыв
         })
 
-    return render(request, 'main/orders.html', {'orders': formatted_orders})
+    return render(request, 'main/orders.html', {'orders': formatted_orders, 'page': page})
 
 
 # Обработка подтверждения заказа из корзины при нажатии кнопки "Подтвердить заказ"
@@ -161,45 +268,47 @@ def confirm_order(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    cart_items = Cart.objects.filter(user=request.user)
+    cart_items = list(Cart.objects.filter(user=request.user).select_related('product').order_by('id'))
     if not cart_items:
         messages.error(request, "Ваша корзина пуста. Добавьте товары, чтобы оформить заказ.")
         return redirect('cart')
 
-    # Проверяем, есть ли пустые адреса
     if request.method == "POST":
-        missing_addresses = [item for item in cart_items if not request.POST.get(f"address_{item.id}", "").strip()]
-        if missing_addresses:
-            messages.warning(request, "Укажите адрес доставки для всех товаров в корзине.")
-            return redirect('cart')
-
-        # ✅ Сохраняем введенные данные в Cart
+        # ✅ Переносим введенные данные в строки корзины и проверяем адреса (без запросов к базе)
+        changed = []
         for item in cart_items:
-            item.address = request.POST.get(f"address_{item.id}", "").strip()
-            item.card_text = request.POST.get(f"card_text_{item.id}", "").strip()
-            item.signature = request.POST.get(f"signature_{item.id}", "").strip()
-            item.save()
-
-    # ✅ Формируем структуру заказа для отображения на странице подтверждения
+            details = (
+                request.POST.get(f"address_{item.id}", "").strip(),
+                request.POST.get(f"card_text_{item.id}", "").strip(),
+                request.POST.get(f"signature_{item.id}", "").strip(),
+            )
+            if not details[0]:
+                messages.warning(request, "Укажите адрес доставки для всех товаров в корзине.")
+                return redirect('cart')
+            if details != (item.address, item.card_text, item.signature):
+                item.address, item.card_text, item.signature = details
+                changed.append(item)
+
+        # Сохраняем все изменения одним запросом (совпавшие позиции объединяются)
+        cart_items = save_cart_details(request.user, cart_items, changed)
+
+    # ✅ Формируем структуру заказа и итог за один проход
     order_summary = []
+    total_price = 0
     for item in cart_items:
-        address = item.address  # Теперь берем из Cart, а не из POST
-        text = item.card_text
-        signature = item.signature
-
-        # Логика формирования текста открытки
-        card_info = generate_card_info(text, signature)
-
+        price = item.product.price * item.quantity
+        total_price += price
         order_summary.append({
             "bouquet_name": item.product.name,
-            "delivery_address": address,
-            "card_info": card_info,  # ✅ Теперь передаем список пар
-            "price": item.product.price,
+            "delivery_address": item.address,  # Берем из Cart, а не из POST
+            "card_info": generate_card_info(item.card_text, item.signature),  # ✅ Список пар
+            "quantity": item.quantity,
+            "price": price,
         })
 
     return render(request, "main/cart_confirm.html", {
         "order_summary": order_summary,
-        "total_price": sum(item.product.price for item in cart_items),
+        "total_price": total_price,
     })
 
 
@@ -208,39 +317,49 @@ def finalize_order(request):
     if not request.user.is_authenticated:
         return redirect('login')
 
-    cart_items = Cart.objects.filter(user=request.user)
-    if not cart_items:
+    cart_lines = list(Cart.objects.filter(user=request.user).select_related('product').order_by('id'))
+    if not cart_lines:
         messages.error(request, "Ваша корзина пуста. Добавьте товары, чтобы оформить заказ.")
         return redirect('cart')
+    cart_items = expand_cart_lines(cart_lines)  # Каждый букет из позиции - отдельный заказ
 
     user = request.user
     telegram_chat_id = user.telegram_chat_id
 
-    for item in cart_items:
-        order = Order.objects.create(
-            user=user,
-            telegram_chat_id=telegram_chat_id,
-            status='accepted',
-            total_price=item.product.price,
-            address=item.address,  # ✅ Теперь берем данные из Cart!
-            card_text=item.card_text,
-            signature=item.signature,
-        )
-
-        # Сохраняем заказ
-        order.products.set([item.product])
-        order.save()
+    # Заказы, их букеты, сводка продаж и уведомление записываются в одной транзакции
+    # фиксированным числом запросов, независимо от размера корзины
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user,
+                telegram_chat_id=telegram_chat_id,
+                status='accepted',
+                total_price=item.product.price,
+                address=item.address,  # ✅ Теперь берем данные из Cart!
+                card_text=item.card_text,
+                signature=item.signature,
+            )
+            for item in cart_items
+        ])
+
+        # Привязываем букеты к заказам одной вставкой в связующую таблицу
+        Order.products.through.objects.bulk_create([
+            Order.products.through(order_id=order.id, product_id=item.product_id)
+            for order, item in zip(orders, cart_items)
+        ])
+
+        # bulk_create не вызывает сигналы, поэтому сводку обновляем сами
+        record_orders(orders, {order.id: item.product_id for order, item in zip(orders, cart_items)})
+        apply_sold_deltas(Counter(item.product_id for item in cart_items))  # Популярность букетов - тоже сами
 
         if telegram_chat_id:
-            header = f"🛍 *Ваш заказ №{order.id} подтверждён!*\n\n"
-            message_text = header + send_order_notification(order)
-            message_text += "------------------------\n🌸 Ожидайте дальнейшей информации о статусе заказа!"
-            send_telegram_message(telegram_chat_id, message_text)
+            models.prefetch_related_objects(orders, 'products')  # Букеты для текста одним запросом
+            enqueue_telegram_messages(telegram_chat_id, generate_checkout_messages(orders))  # Одно уведомление на заказ
 
-        # -------------------------------
-
-    cart_items.delete()  # ✅ Очищаем корзину
+        Cart.objects.filter(id__in=[line.id for line in cart_lines]).delete()  # ✅ Очищаем корзину
 
+    invalidate_cart_item_count(user)  # После транзакции: корзина уже пуста
+    invalidate_bot_orders(user.id)  # bulk_create не вызывает сигналы - список заказов в боте сбрасываем сами
     return redirect('user_orders')  # Перенаправляем на "Мои заказы"
 
 
@@ -275,15 +394,16 @@ def leave_review(request, order_id):
 def repeat_order(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
 
-    # Создаем новые элементы в корзине
+    # Возвращаем букеты заказа в корзину с тем же адресом и открыткой
     for product in order.products.all():
-        Cart.objects.create(
-            user=request.user,
-            product=product,
+        add_cart_line(
+            request.user,
+            product.id,
             address=order.address,
             card_text=order.card_text,
             signature=order.signature,
         )
+    invalidate_cart_item_count(request.user)
 
     messages.success(request, "Товары из заказа добавлены в корзину!")
     return redirect("cart")
@@ -300,10 +420,14 @@ def admin_reports(request):
     if not request.user.is_superuser:
         return redirect("home")  # Доступ только для админа
 
-    total_orders = Order.objects.count()  # Отчет: Общее количество заказов
+    sales = DailySales.objects.all()  # Отчеты строятся по ежедневной сводке продаж
+
+    # Отчет: Общее количество заказов и общая выручка
+    totals = sales.aggregate(count=models.Sum("order_count"), revenue=models.Sum("revenue"))
+    total_orders = totals["count"] or 0
 
     # Отчет: Количество заказов по статусам
-    status_counts = Order.objects.values("status").annotate(count=models.Count("id"))
+    status_counts = sales.values("status").annotate(count=models.Sum("order_count")).filter(count__gt=0)
 
     # Формируем удобную структуру
     orders_by_status = {
@@ -315,28 +439,30 @@ def admin_reports(request):
 
     # Отчет: Самые популярные букеты
     popular_bouquets = (
-        Order.objects.values("products__name")
-        .annotate(total=models.Count("products"))
+        sales.filter(product__isnull=False)
+        .values("product__name")
+        .annotate(total=models.Sum("order_count"))
+        .filter(total__gt=0)
         .order_by("-total")[:5]  # Топ-5 самых популярных букетов
     )
 
     # Отчет: Рассчитываем средний чек заказов
-    average_order_value = Order.objects.aggregate(avg_price=models.Avg("total_price"))["avg_price"] or 0
+    average_order_value = (totals["revenue"] or 0) / total_orders if total_orders else 0
 
 
     # Отчет: Общая сумма выручки за день/неделю/месяц
-    # Дата сегодня
-    today = now().date()
-
-    # Фильтрация заказов по дате
-    revenue_today = Order.objects.filter(created_at__date=today).aggregate(total=models.Sum("total_price"))[
-                        "total"] or 0
-    revenue_week = \
-    Order.objects.filter(created_at__gte=today - timedelta(days=7)).aggregate(total=models.Sum("total_price"))[
-        "total"] or 0
-    revenue_month = \
-    Order.objects.filter(created_at__gte=today - timedelta(days=30)).aggregate(total=models.Sum("total_price"))[
-        "total"] or 0
+    # Периоды - полуоткрытые интервалы дней в часовом поясе проекта
+    periods = report_periods()
+
+    # Фильтрация сводки по дням
+    revenue = sales.aggregate(
+        today=models.Sum("revenue", filter=period_filter(periods["today"])),
+        week=models.Sum("revenue", filter=period_filter(periods["week"])),
+        month=models.Sum("revenue", filter=period_filter(periods["month"])),
+    )
+    revenue_today = revenue["today"] or 0
+    revenue_week = revenue["week"] or 0
+    revenue_month = revenue["month"] or 0
 
 
     return render(request, "main/admin_reports.html", {
@@ -348,6 +474,7 @@ def admin_reports(request):
         "revenue_today": revenue_today,  # ✅ Выручка за сегодня
         "revenue_week": revenue_week,    # ✅ Выручка за неделю
         "revenue_month": revenue_month,  # ✅ Выручка за месяц
+        "export_form": OrderExportForm(xlsx=xlsx_available()),  # Параметры выгрузки заказов
     })
 
 
@@ -362,4 +489,62 @@ def download_report(request):
     # Создаем HTTP-ответ с файлом
     response = HttpResponse(report_content, content_type="text/plain")
     response["Content-Disposition"] = "attachment; filename=order_report.txt"
-    return response
\ No newline at end of file
+    return response
+
+
+# Выгрузка заказов за период для бухгалтерии (потоковая, см. main/exports.py)
+def export_orders(request):
+    if not request.user.is_staff:
+        return HttpResponse("У вас нет доступа к выгрузке заказов.", status=403)
+
+    form = OrderExportForm(request.GET, xlsx=xlsx_available())
+    if not form.is_valid():
+        return HttpResponseBadRequest("; ".join(error for errors in form.errors.values() for error in errors))
+
+    date_from, date_to = form.cleaned_data["date_from"], form.cleaned_data["date_to"]
+    # Полуоткрытый интервал в часовом поясе проекта: конечный день входит в выгрузку целиком
+    start, end = local_date_range(date_from, date_to + timedelta(days=1) if date_to else None)
+    orders = export_queryset(start, end, form.cleaned_data["status"])
+
+    filename = f"orders_{date_from or 'all'}_{date_to or localdate()}"
+    if form.cleaned_data["file_format"] == "xlsx":
+        return FileResponse(
+            write_xlsx(orders), as_attachment=True, filename=f"{filename}.xlsx",
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    chunks = stream_csv(orders)
+    if isinstance(request, ASGIRequest):
+        chunks = async_chunks(chunks)  # Синхронный итератор ASGI-сервер отдал бы только целиком
+    response = StreamingHttpResponse(chunks, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f"attachment; filename={filename}.csv"
+    return response
+
+
+# ------------ Telegram webhook -------------------------
+
+# Telegram присылает обновления POST-запросом (setWebhook, см. команду set_telegram_webhook)
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    if not secret:
+        raise Http404  # Webhook не настроен - бот работает через long polling
+
+    # Telegram передает секрет, указанный в setWebhook, в этом заголовке
+    if not constant_time_compare(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret):
+        return HttpResponseForbidden()
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not isinstance(data, dict) or "update_id" not in data:
+        return HttpResponseBadRequest()
+
+    # Те же обработчики, что и при polling. Импортируем при первом запросе, а не при загрузке urls.
+    from telegram_bot import bot
+    from main.bot_runtime import process_update
+
+    # Обработчики синхронные (ORM, telebot) - выполняем в отдельном потоке, не блокируя цикл событий
+    await sync_to_async(process_update, thread_sensitive=False)(bot, data)
+    return HttpResponse()
@@ -1,3 +1,4 @@
+import io
 import os
 import django
 
@@ -8,30 +9,34 @@ django.setup()
 
 
 import telebot
-import requests  # Библиотека для HTTP-запросов
+from telebot import apihelper
 from decouple import config
-from main.models import User, Order
+from main.models import User, Order, DailySales
+from django.db.models import Sum
 from main.reports import generate_text_report  # Импортируем функцию отчета
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton
+from main.sales import period_filter, report_periods
+from main.bot_users import ChatUsers, parse_admin_ids
+from main.bot_orders import CALLBACK_PREFIX as ORDERS_CALLBACK_PREFIX, get_orders_page, orders_keyboard
+from main.telegram_api import get_client, telebot_request_sender
+from main.bot_runtime import AsyncBotRuntime
+from telebot.types import InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from django.conf import settings  # Чтобы получать ID админа из settings.py
-from django.urls import reverse
-from datetime import datetime
 
 
 
 # Токен бота
 BOT_TOKEN = config("TELEGRAM_BOT_TOKEN")
-bot = telebot.TeleBot(BOT_TOKEN)
+apihelper.CUSTOM_REQUEST_SENDER = telebot_request_sender  # Все запросы бота - через общий клиент с лимитами
+bot = telebot.TeleBot(BOT_TOKEN, threaded=False)  # Потоками управляет AsyncBotRuntime
 MY_SITE = config("SITE_URL")
+BOT_MODE = config("TELEGRAM_BOT_MODE", default="async")  # async - параллельная обработка, polling - по одному (webhook обслуживает сайт)
 ADMIN_TELEGRAM_ID = settings.ADMIN_TELEGRAM_ID
+chat_users = ChatUsers(parse_admin_ids(ADMIN_TELEGRAM_ID))  # chat_id -> пользователь сайта, кэш в памяти процесса
 
 
 def send_telegram_message(chat_id, text):
     """Отправляет сообщение в Telegram"""
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
-    response = requests.post(url, data=payload)
-    return response.json()  # Можно использовать для отладки
+    return get_client().send_message(chat_id, text, parse_mode="Markdown")  # Можно использовать для отладки
 
 
 # Команда /start
@@ -40,25 +45,20 @@ def start(message):
     args = message.text.split()
     if len(args) > 1: # Проверяем, есть ли параметры в команде
         user_id = args[1] # Получаем ID пользователя из параметра
-        try:
-            user = User.objects.get(id=user_id)
-            user.telegram_chat_id = message.chat.id # Сохраняем Telegram ID в модели User
-            user.save()
-            user_from_db = User.objects.get(pk=user.id)
-
-            # Привязываем Telegram ID к заказам пользователя
-            orders = Order.objects.filter(user=user)
-            for order in orders:
-                order.telegram_chat_id = message.chat.id
-                order.save()
 
+        # Сохраняем Telegram ID в модели User одним UPDATE
+        linked = user_id.isdigit() and User.objects.filter(id=user_id).update(telegram_chat_id=message.chat.id)
+        if linked:
+            # Привязываем Telegram ID ко всем заказам пользователя одним UPDATE (без сигналов и перебора заказов)
+            Order.objects.filter(user_id=user_id).update(telegram_chat_id=message.chat.id)
+            chat_users.relinked(message.chat.id, int(user_id))  # Кэш чата и прежних чатов пользователя
             bot.reply_to(message, "Ваш Telegram успешно привязан! Вы будете получать уведомления о заказах.")
-        except User.DoesNotExist:
+        else:
             bot.reply_to(message, "Ошибка: пользователь не найден.")
 
 
 
-    if str(message.chat.id) == ADMIN_TELEGRAM_ID:
+    if is_admin(message.chat.id):
         # Если админ, отправляем его сразу в панель администратора
         admin_panel(message)
     else:
@@ -85,46 +85,39 @@ def go_to_site(message):
 # Кнопка Мои заказы - для пользователя
 @bot.message_handler(func=lambda message: message.text == "📦 Мои заказы")
 def my_orders(message):
-    user = User.objects.filter(telegram_chat_id=message.chat.id).first()
+    user_id = chat_users.get(message.chat.id).user_id  # Из кэша процесса, без запроса для активных пользователей
 
-    if not user:
+    if not user_id:
         bot.send_message(message.chat.id, "❌ Вы не зарегистрированы на сайте. Пожалуйста, зарегистрируйтесь.")
         return
 
-    orders = Order.objects.filter(user=user).order_by('-created_at')[:5]
+    # Текст страницы строится двумя запросами и кэшируется до изменения заказов или отзывов
+    text, next_cursor = get_orders_page(user_id)
+    bot.send_message(message.chat.id, text, parse_mode="Markdown", reply_markup=orders_markup(None, next_cursor))
 
-    if not orders.exists():
-        bot.send_message(message.chat.id, "📭 У вас пока нет заказов.")
-        return
-
-    # Формируем текст сообщения
-    orders_message = "📦 *Ваши последние заказы:*\n\n"
-
-    for order in orders:
-        orders_message += f"🔹 *Заказ №{order.id}*\n"
-        orders_message += f"📅 Дата: {order.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-        orders_message += f"🔄 Статус: {order.get_status_display()}\n"
-        orders_message += f"💐 Букет: {order.products.first().name if order.products.exists() else 'Не указан'}\n"
-
-        # Ссылка для отзыва, если статус "Доставлен" и отзыв не оставлен
-        if order.status == "delivered" and not hasattr(order, "review"):
-            review_url = f"{MY_SITE}{reverse('leave_review', args=[order.id])}"
-            orders_message += f"📝 [Оставить отзыв]({review_url})\n"
 
-        # Ссылка для повторного заказа
-        reorder_url = f"{MY_SITE}{reverse('product_detail', args=[order.products.first().id])}"
-        orders_message += f"🔄 [Повторить заказ]({reorder_url})\n"
+# Листание заказов кнопками под сообщением "Мои заказы"
+@bot.callback_query_handler(func=lambda call: call.data.startswith(ORDERS_CALLBACK_PREFIX))
+def my_orders_page(call):
+    bot.answer_callback_query(call.id)
+    user_id = chat_users.get(call.message.chat.id).user_id
+    if not user_id:
+        return
 
-        orders_message += "------------------------\n"
+    cursor = call.data[len(ORDERS_CALLBACK_PREFIX):] or None
+    text, next_cursor = get_orders_page(user_id, cursor)
+    bot.edit_message_text(
+        text,
+        call.message.chat.id,
+        call.message.message_id,
+        parse_mode="Markdown",
+        reply_markup=orders_markup(cursor, next_cursor),
+    )
 
-    # Добавляем ссылку на сайт
-    orders_message += f"\n🌐 [Посмотреть все заказы]({MY_SITE}/orders/)"
 
-    bot.send_message(
-        message.chat.id,
-        orders_message,
-        parse_mode="Markdown"
-    )
+def orders_markup(cursor, next_cursor):
+    keyboard = orders_keyboard(cursor, next_cursor)
+    return InlineKeyboardMarkup.de_json(keyboard) if keyboard else None
 
 
 
@@ -135,11 +128,10 @@ def connect_user(message):
     chat_id = message.chat.id
     username = message.from_user.username
 
-    # Ищем последний заказ пользователя
-    active_order = Order.objects.filter(user__username=username).last()
-    if active_order:
-        active_order.telegram_chat_id = chat_id
-        active_order.save()
+    # Ищем последний заказ пользователя и привязываем его одним UPDATE
+    active_order_id = Order.objects.filter(user__username=username).values_list('id', flat=True).last()
+    if active_order_id:
+        Order.objects.filter(id=active_order_id).update(telegram_chat_id=chat_id)
         bot.reply_to(message, "Ваш Telegram ID успешно связан с последним заказом!")
     else:
         bot.reply_to(message, "У вас нет активных заказов.")
@@ -149,14 +141,14 @@ def connect_user(message):
 # ----------- Панель администратора ---------------------------------
 
 def is_admin(chat_id):
-    """Проверяем, является ли пользователь администратором"""
-    return str(chat_id) in settings.ADMIN_TELEGRAM_ID
+    """Проверяем, является ли пользователь администратором (точное совпадение со списком из настроек)"""
+    return chat_users.is_admin(chat_id)
 
 
 @bot.message_handler(commands=['admin_panel'])
 def admin_panel(message):
     """ Проверяем, что сообщение от администратора, и отправляем меню """
-    if str(message.chat.id) != str(ADMIN_TELEGRAM_ID):
+    if not is_admin(message.chat.id):
         bot.send_message(message.chat.id, "⛔ У вас нет доступа к этой панели.")
         return
 
@@ -178,16 +170,12 @@ def send_text_report(message):
 
     # Генерируем текстовый отчет
     report_text = generate_text_report()
-    report_path = "report_today.txt"
 
-    with open(report_path, "w", encoding="utf-8") as file:
-        file.write(report_text)
-
-    # Отправляем файл в Телеграм
-    with open(report_path, "rb") as file:
-        bot.send_document(message.chat.id, file, caption="📄 Текстовый отчет за сегодня")
-
-    os.remove(report_path)  # Удаляем файл после отправки
+    # Отправляем файл в Телеграм прямо из памяти: обработчики работают параллельно,
+    # общий файл на диске два админа перезаписали бы друг другу
+    report_file = io.BytesIO(report_text.encode("utf-8"))
+    report_file.name = "report_today.txt"  # Имя файла в Телеграме
+    bot.send_document(message.chat.id, report_file, caption="📄 Текстовый отчет за сегодня")
 
 
 # Отчет Выручка за сегодня - для Админа
@@ -198,9 +186,8 @@ def send_daily_revenue(message):
         return
 
     # Считаем выручку за сегодня
-    today = datetime.now().date()
-    orders_today = Order.objects.filter(created_at__date=today)
-    revenue_today = sum(order.total_price for order in orders_today)
+    today = report_periods()["today"]  # По часовому поясу проекта, а не сервера
+    revenue_today = DailySales.objects.filter(period_filter(today)).aggregate(total=Sum("revenue"))["total"] or 0
 
     bot.send_message(
         message.chat.id,
@@ -217,8 +204,8 @@ def send_daily_orders_count(message):
         return
 
     # Считаем количество заказов за сегодня
-    today = datetime.now().date()
-    orders_today_count = Order.objects.filter(created_at__date=today).count()
+    today = report_periods()["today"]
+    orders_today_count = DailySales.objects.filter(period_filter(today)).aggregate(total=Sum("order_count"))["total"] or 0
 
     bot.send_message(
         message.chat.id,
@@ -231,7 +218,12 @@ def send_daily_orders_count(message):
 
 def main():
     print("Бот запущен...")
-    bot.polling()
+    # getUpdates не работает, пока установлен webhook: переходим на polling (запасной режим)
+    get_client().call("deleteWebhook")
+    if BOT_MODE == "polling":
+        bot.polling()  # Запасной режим: обновления обрабатываются по одному
+    else:
+        AsyncBotRuntime(bot).run_forever()
 
 if __name__ == "__main__":
     main()